@@ -6,11 +6,17 @@ import matplotlib.pyplot as plt
 import numpy as np
 import csv
 import plotly.graph_objects as go
-import re
+
+# snapshot_file / manifest live next to collect_data_bulk, one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import snapshot_file
+import manifest
 
 NAN = float('nan')
 
 def get_data(filename):
+    if filename.endswith(".snap"):
+        return snapshot_file.load_compat(filename)
     file = open(filename)
     reader = csv.reader(file)
     value_labels = next(reader)
@@ -95,25 +101,18 @@ SAVE_PATH = os.path.join(os.environ["EUVL_PATH"], "datasets")
 def main():
     #substitute -l with latest data, if unspecified use latest eposure and latest sapshot
     if len(sys.argv) >= 3: # if specified
-        exposure = sys.argv[1] if sys.argv[1] != '-l' else sorted(os.listdir(SAVE_PATH), key=lambda x: os.path.getctime(os.path.join(SAVE_PATH, x)))[-1]
+        exposure = sys.argv[1] if sys.argv[1] != '-l' else manifest.latest_exposure(SAVE_PATH)
         snapshot = int(sys.argv[2]) if sys.argv[2] != '-l' else -1
     else:
-        exposure = sorted(os.listdir(SAVE_PATH), key=lambda x: os.path.getctime(os.path.join(SAVE_PATH, x)))[-1]
+        exposure = manifest.latest_exposure(SAVE_PATH)
         snapshot = -1
     
     foldername = os.path.join(SAVE_PATH, f"{exposure}")
 
-    existing_files = os.listdir(foldername)
-    print(existing_files)
-
-    pattern = re.compile(r"snapshot_(\d+).csv")
+    segments = manifest.segments(foldername)
+    print([segment["snapshot"] for segment in segments])
 
-    nums = [
-            int(match.group(1))
-            for filename in existing_files
-            if (match := pattern.match(filename))
-                ]
-    filename = os.path.join(foldername, f"snapshot_{sorted(nums)[snapshot]}.csv")
+    filename = os.path.join(foldername, segments[snapshot]["snapshot"])
     labels, values = get_data(filename)
 
     print(filename)
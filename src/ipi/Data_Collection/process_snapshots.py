@@ -7,7 +7,12 @@ import matplotlib.pyplot as plt
 import numpy as np
 import csv
 import plotly.graph_objects as go
-import re
+import argparse
+
+# snapshot_file / manifest live next to collect_data_bulk, one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import snapshot_file
+import manifest
 
 NAN = float('nan')
 
@@ -19,6 +24,8 @@ RESP_A_PER_W = 0.22
 AREA_CM2 = (19.7/4) / 100.0
 
 def get_data(filename):
+    if filename.endswith(".snap"):
+        return snapshot_file.load_compat(filename)
     file = open(filename)
     reader = csv.reader(file)
     value_labels = next(reader)
@@ -101,17 +108,15 @@ def rolling_average(values, window_size):
 SAVE_PATH = os.path.join(os.environ["EUVL_PATH"], "datasets")
 
 def main():
-    #substitute -l with latest data, if unspecified use latest eposure and latest sapshot
-    exposures = []
-    if len(sys.argv) >= 2: # if specified
-        for arg in sys.argv[1:]:
-            exposures.append(arg)
-    else:
-        exposures.append(sorted(os.listdir(SAVE_PATH), key=lambda x: os.path.getctime(os.path.join(SAVE_PATH, x)))[-1])
-
-
-    
-    pulses = []
+    # exposures to process, latest if none; --start / --end: epoch s or ISO time
+    ap = argparse.ArgumentParser()
+    ap.add_argument("exposures", nargs="*")
+    ap.add_argument("--start", type=manifest.parse_time)
+    ap.add_argument("--end", type=manifest.parse_time)
+    args = ap.parse_args()
+    exposures = args.exposures or [manifest.latest_exposure(SAVE_PATH)]
+
+    pulses = []     # (times, sum [V], points, peak [V]) per pulse
     chopper = []
     start_time = 0
 
@@ -119,75 +124,85 @@ def main():
         print(f"Processing: {exposure}")
         foldername = os.path.join(SAVE_PATH, f"{exposure}")
 
-        existing_files = os.listdir(foldername)
-
-        pattern = re.compile(r"snapshot_(\d+).csv")
-
-        nums = [
-                int(match.group(1))
-                for filename in existing_files
-                if (match := pattern.match(filename))
-                    ]
+        segments = manifest.segments(foldername, args.start, args.end)
         exp_begin_time = 0
 
-        for i in range(len(nums)):
-            pulses_fn = os.path.join(foldername, f"snapshot_{sorted(nums)[i]}.csv")
-            nums_fn = os.path.join(foldername, f"pulses_{sorted(nums)[i]}.dat")
-            chopper_fn = os.path.join(foldername, f"chopper_{sorted(nums)[i]}.csv")
-
-            print(f"Processing: {pulses_fn} ({i + 1} / {len(nums)})")
-            labels, values = get_data(pulses_fn)
-
-
-            increment = 0
-
-            nums_file = open(nums_fn)
-
-            for line in nums_file:
-                end_index = 0
-                if line.find(','):
-                    end_index = int(line.strip().split(',')[0])
-
-                    if exp_begin_time == 0:
-                        exp_begin_time = float(line.strip().split(',')[1])
-                else:
-                    end_index = int(line.strip())
-
-                if increment == 0 and end_index != 0:
-                    increment = end_index
-                    break
-
-            nums_file.close()
-            nums_file = open(nums_fn)
-
-            for line in nums_file:
-                start_index = 0
-                if line.find(','):
-                    start_index = int(line.strip().split(',')[0])
-                else:
-                    start_index = int(line.strip())
-
-                end_index = start_index + increment
-
-                if line.find(','):
-                    pulses.append(([(float(line.strip().split(',')[1]) - exp_begin_time)], values[start_index:end_index, labels['v']]))
-                else:
-                    pulsetimes = np.array(values[start_index:end_index, labels['t']])
-                    pulsetimes += start_time
-
-                    pulses.append((pulsetimes, values[start_index:end_index, labels['v']]))
+        for i, segment in enumerate(segments):
+            pulses_fn = os.path.join(foldername, segment["snapshot"])
+            nums_fn = os.path.join(foldername, segment["pulses"])
+            chopper_fn = os.path.join(foldername, segment["chopper"])
+
+            print(f"Processing: {pulses_fn} ({i + 1} / {len(segments)})")
+            if pulses_fn.endswith(".snap"):
+                # sum and peak of every pulse straight from the ADC codes, no (t, v) table
+                snap = snapshot_file.open_snapshot(pulses_fn)
+                keep = manifest.in_range(snap.epochs_ns, args.start, args.end)
+                epochs_s = snap.epochs_ns[keep] / 1e9
+                if exp_begin_time == 0 and len(epochs_s):
+                    exp_begin_time = epochs_s[0]
+                frames = snap.scaled(keep)
+                pulses += zip(([e - exp_begin_time] for e in epochs_s), frames.sum(), [snap.n_points] * len(frames), frames.peak())
+                # time the segment spans, first frame to the end of the last (none if empty / nothing flushed)
+                last_t = (snap.epochs_ns[-1] - snap.epochs_ns[0]) / 1e9 + snap.t[-1] if len(snap) else 0
+            else:
+                labels, values = get_data(pulses_fn)
+
+
+                increment = 0
+
+                with open(nums_fn) as nums_file:
+                    lines = nums_file.readlines()
+
+                for line in lines:
+                    end_index = 0
+                    if line.find(','):
+                        end_index = int(line.strip().split(',')[0])
+
+                        if exp_begin_time == 0:
+                            exp_begin_time = float(line.strip().split(',')[1])
+                    else:
+                        end_index = int(line.strip())
+
+                    if increment == 0 and end_index != 0:
+                        increment = end_index
+                        break
+
+                for line in lines:
+                    start_index = 0
+                    if line.find(','):
+                        start_index = int(line.strip().split(',')[0])
+                    else:
+                        start_index = int(line.strip())
+
+                    end_index = start_index + increment
+
+                    if line.find(','):
+                        pulse = values[start_index:end_index, labels['v']]
+                        pulses.append(([(float(line.strip().split(',')[1]) - exp_begin_time)], np.sum(pulse), len(pulse), np.max(pulse)))
+                    else:
+                        pulsetimes = np.array(values[start_index:end_index, labels['t']])
+                        pulsetimes += start_time
+
+                        pulse = values[start_index:end_index, labels['v']]
+                        pulses.append((pulsetimes, np.sum(pulse), len(pulse), np.max(pulse)))
+                last_t = values[-1, labels['t']]
 
             try:
                 chopper_file = open(chopper_fn)
+                origin = segment.get("chopper_origin_ns")
                 print(exp_begin_time)
                 for line in chopper_file:
                     if line.startswith("t"):
                         continue
                     #print(line.strip().split(','))
                     (t, phase, sync) = line.strip().split(',')
+                    # t counts from the first arm: filtered on epoch ns where the manifest has that origin
+                    if origin is not None and ((args.start is not None and float(t) + origin < args.start)
+                                               or (args.end is not None and float(t) + origin > args.end)):
+                        continue
                     chopper.append([float(t) / 1000000000.0, float(phase)])
 
-                start_time += values[-1, labels['t']]
+                start_time += last_t
                 chopper_file.close()
             except FileNotFoundError:
                 pass
@@ -199,9 +214,8 @@ def main():
 
     SAMPLE_dT = 10 / 1e9
 
-    for times, pulse in pulses:
-        sum = np.sum(pulse)
-        pulse_int_time = len(pulse) * SAMPLE_dT
+    for times, sum, n, peak in pulses:
+        pulse_int_time = n * SAMPLE_dT
         auc_volt_sec = sum * pulse_int_time
         Q_coulombs = auc_volt_sec / RESISTOR_OHMS
         E_joules = Q_coulombs / RESP_A_PER_W
@@ -223,8 +237,7 @@ def main():
     values = []
     ptimes = [] 
 
-    for times, pulse in pulses:
-        peak = np.max(pulse)
+    for times, sum, n, peak in pulses:
         peaks.append([times[0], peak])
 
     chopper_acc = dict()
@@ -7,7 +7,12 @@ import matplotlib.pyplot as plt
 import numpy as np
 import csv
 import plotly.graph_objects as go
-import re
+import argparse
+
+# snapshot_file / manifest live next to collect_data_bulk, one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import snapshot_file
+import manifest
 
 NAN = float('nan')
 
@@ -19,6 +24,8 @@ RESP_A_PER_W = 0.14
 AREA_CM2 = (5) / 100.0
 
 def get_data(filename):
+    if filename.endswith(".snap"):
+        return snapshot_file.load_compat(filename)
     file = open(filename)
     reader = csv.reader(file)
     value_labels = next(reader)
@@ -36,6 +43,11 @@ def get_data(filename):
 
     return labels_dict, np.array(values)
 
+def pulse_stats(pulse, off_num):
+    """(area, points, peak) of one pulse [V], both over the mean of its first off_num points."""
+    off_avg = np.average(pulse[:off_num])
+    return np.trapezoid(pulse - off_avg) / len(pulse), len(pulse), np.max(pulse) - off_avg
+
 def time_based_average(values, window_size):
     begin_time = values[0, 0]
     avg = 0.0
@@ -101,79 +113,103 @@ def rolling_average(values, window_size):
 SAVE_PATH = os.path.join(os.environ["EUVL_PATH"], "datasets")
 
 def main():
-    #substitute -l with latest data, if unspecified use latest eposure and latest sapshot
-    exposures = []
-    if len(sys.argv) >= 2: # if specified
-        for arg in sys.argv[1:]:
-            exposures.append(arg)
-    else:
-        exposures.append(sorted(os.listdir(SAVE_PATH), key=lambda x: os.path.getctime(os.path.join(SAVE_PATH, x)))[-1])
-    
-    pulses = []
+    # exposures to process, latest if none; --start / --end: epoch s or ISO time
+    ap = argparse.ArgumentParser()
+    ap.add_argument("exposures", nargs="*")
+    ap.add_argument("--start", type=manifest.parse_time)
+    ap.add_argument("--end", type=manifest.parse_time)
+    args = ap.parse_args()
+    exposures = args.exposures or [manifest.latest_exposure(SAVE_PATH)]
+
+    pulses = []     # (times, baseline-subtracted mean area [V], points, peak over baseline [V]) per pulse
     chopper = []
+    OFF_NUM = 98    # baseline points before the pulse
     start_time = 0
 
+    # pulse accounting from bursts_N.csv (older datasets don't have it)
+    captured_pulses = 0
+    fired_pulses = 0
+    have_bursts = True
+
     for exposure in exposures:
         print(f"Processing: {exposure}")
         foldername = os.path.join(SAVE_PATH, f"{exposure}")
 
-        existing_files = os.listdir(foldername)
-
-        pattern = re.compile(r"snapshot_(\d+).csv")
-
-        nums = [
-                int(match.group(1))
-                for filename in existing_files
-                if (match := pattern.match(filename))
-                    ]
+        segments = manifest.segments(foldername, args.start, args.end)
         exp_begin_time = 0
 
-        for i in range(len(nums)):
-            pulses_fn = os.path.join(foldername, f"snapshot_{sorted(nums)[i]}.csv")
-            nums_fn = os.path.join(foldername, f"pulses_{sorted(nums)[i]}.dat")
-            chopper_fn = os.path.join(foldername, f"chopper_{sorted(nums)[i]}.csv")
-
-            print(f"Processing: {pulses_fn} ({i + 1} / {len(nums)})")
-            labels, values = get_data(pulses_fn)
-
-
-            increment = 0
-
-            nums_file = open(nums_fn)
-
-            for line in nums_file:
-                end_index = 0
-                if line.find(','):
-                    end_index = int(line.strip().split(',')[0])
-
-                    if exp_begin_time == 0:
-                        exp_begin_time = float(line.strip().split(',')[1])
-                else:
-                    end_index = int(line.strip())
-
-                if increment == 0 and end_index != 0:
-                    increment = end_index
-                    break
-
-            nums_file.close()
-            nums_file = open(nums_fn)
-
-            for line in nums_file:
-                start_index = 0
-                if line.find(','):
-                    start_index = int(line.strip().split(',')[0])
-                else:
-                    start_index = int(line.strip())
-
-                end_index = start_index + increment
-
-                if line.find(','):
-                    pulses.append(([(float(line.strip().split(',')[1]) - exp_begin_time)], values[start_index:end_index, labels['v']]))
-                else:
-                    pulsetimes = np.array(values[start_index:end_index, labels['t']])
-                    pulsetimes += start_time
-
-                    pulses.append((pulsetimes, values[start_index:end_index, labels['v']]))
+        for i, segment in enumerate(segments):
+            pulses_fn = os.path.join(foldername, segment["snapshot"])
+            nums_fn = os.path.join(foldername, segment["pulses"])
+            bursts_fn = os.path.join(foldername, segment["bursts"])
+
+            print(f"Processing: {pulses_fn} ({i + 1} / {len(segments)})")
+
+            if os.path.exists(bursts_fn):
+                b_labels, bursts = get_data(bursts_fn)
+                if len(bursts):
+                    # share of each burst inside --start / --end (all of it without a range); the gap
+                    # before a burst counts when the burst starts inside
+                    first, last = bursts[:, b_labels['first_s']], bursts[:, b_labels['last_s']]
+                    lo = first if args.start is None else np.maximum(first, args.start / 1e9)
+                    hi = last if args.end is None else np.minimum(last, args.end / 1e9)
+                    span = last - first
+                    inside = np.where(span > 0, np.clip(hi - lo, 0, None) / np.where(span > 0, span, 1), hi >= lo)
+                    captured_pulses += np.sum(bursts[:, b_labels['frames']] * inside)
+                    fired_pulses += (np.sum((bursts[:, b_labels['frames']] + bursts[:, b_labels['missed_within']]) * inside)
+                                     + np.sum(bursts[:, b_labels['missed_before']] * (first == lo) * (first <= hi)))
+            else:
+                have_bursts = False
+
+            if pulses_fn.endswith(".snap"):
+                # baseline, area and peak of every pulse straight from the ADC codes, no (t, v) table
+                snap = snapshot_file.open_snapshot(pulses_fn)
+                keep = manifest.in_range(snap.epochs_ns, args.start, args.end)
+                epochs_s = snap.epochs_ns[keep] / 1e9
+                if exp_begin_time == 0 and len(epochs_s):
+                    exp_begin_time = epochs_s[0]
+                frames = snap.scaled(keep)
+                off = frames.mean(slice(None, OFF_NUM))
+                areas = (frames.trapezoid() - off * (snap.n_points - 1)) / snap.n_points
+                pulses += zip(([e - exp_begin_time] for e in epochs_s), areas, [snap.n_points] * len(frames), frames.peak() - off)
+            else:
+                labels, values = get_data(pulses_fn)
+
+                increment = 0
+
+                with open(nums_fn) as nums_file:
+                    lines = nums_file.readlines()
+
+                for line in lines:
+                    end_index = 0
+                    if line.find(','):
+                        end_index = int(line.strip().split(',')[0])
+
+                        if exp_begin_time == 0:
+                            exp_begin_time = float(line.strip().split(',')[1])
+                    else:
+                        end_index = int(line.strip())
+
+                    if increment == 0 and end_index != 0:
+                        increment = end_index
+                        break
+
+                for line in lines:
+                    start_index = 0
+                    if line.find(','):
+                        start_index = int(line.strip().split(',')[0])
+                    else:
+                        start_index = int(line.strip())
+
+                    end_index = start_index + increment
+
+                    if line.find(','):
+                        pulses.append(([(float(line.strip().split(',')[1]) - exp_begin_time)], *pulse_stats(values[start_index:end_index, labels['v']], OFF_NUM)))
+                    else:
+                        pulsetimes = np.array(values[start_index:end_index, labels['t']])
+                        pulsetimes += start_time
+
+                        pulses.append((pulsetimes, *pulse_stats(values[start_index:end_index, labels['v']], OFF_NUM)))
 
     pulse_doses = []
     #print(pulses[1][0])
@@ -181,16 +217,11 @@ def main():
     print(pulse_time)
 
     SAMPLE_dT = 10 / 1e9
-    pulse_int_time = len(pulses[0][1]) * SAMPLE_dT
+    pulse_int_time = pulses[0][2] * SAMPLE_dT
     print("Pulse num:", len(pulses) / 100)
     print("Area:", AREA_CM2)
-    OFF_NUM = 98
 
-    for times, pulse in pulses:
-        off_avg = np.average(pulse[:OFF_NUM])
-        #print(off_avg)
-        pulse -= off_avg
-        sum = np.trapezoid(pulse) / len(pulse)
+    for times, sum, n, peak in pulses:
         auc_webers = sum * pulse_int_time
         #print(f"nWeber: {auc_volt_sec * 1e9}") 
         Q_coulombs = auc_webers / RESISTOR_OHMS
@@ -209,7 +240,12 @@ def main():
     #print(pulse_doses)
     #print(len(pulse_doses))
     total = np.sum(pulse_doses[:, 1])
-    total *= (times[0] / (len(pulses) / 100))
+    if have_bursts and fired_pulses:
+        # measured coverage: each saved pulse stands for fired / saved pulses (skipped by SAVE_RATE or missed)
+        print(f"Pulse coverage = {captured_pulses / fired_pulses:.4f} ({fired_pulses - captured_pulses:.0f} missed)")
+        total *= fired_pulses / len(pulses)
+    else:
+        total *= (times[0] / (len(pulses) / 100))
     print(f"Total dose = {total} mJ")
 
         # 7. Calculate metrics for this file
@@ -219,8 +255,7 @@ def main():
     values = []
     ptimes = [] 
 
-    for times, pulse in pulses:
-        peak = np.max(pulse)
+    for times, sum, n, peak in pulses:
         peaks.append([times[0], peak])
 
     peaks = np.array(peaks)
@@ -0,0 +1,132 @@
+"""
+Ways to wait for a sequence burst to finish after :TRIGger:RUN.
+
+Every strategy gets armed(n_frames) right after the arm commands and then
+wait(inst, reader), which returns once the scope reports the acquisition
+stopped. inst needs write(), reader needs read_line() (scope_io.BlockReader).
+"""
+import time
+
+def _is_stopped(inst, reader):
+    inst.write(":TRIG:STAT?")
+    return "STOP" in reader.read_line().upper()
+
+class TrigStatPoll:
+    """The original loop: :TRIG:STAT? every `interval` seconds."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.queries = 0
+
+    def armed(self, n_frames):
+        pass
+
+    def wait(self, inst, reader):
+        while True:
+            self.queries += 1
+            if _is_stopped(inst, reader):
+                return
+            time.sleep(self.interval)
+
+class OpcWait:
+    """
+    A single *OPC? that the scope answers once the armed acquisition is done.
+
+    One query per burst, no polling latency, but the VISA timeout has to cover
+    the whole burst, so it is raised to `n_frames / pulse_rate + slack` for the
+    duration of the wait. Only works on firmware that holds *OPC? while a
+    SINGle sequence is running; use PredictedWait otherwise.
+    """
+
+    def __init__(self, pulse_rate, slack=5.0):
+        self.pulse_rate = pulse_rate
+        self.slack = slack
+        self.expected = 0.0
+        self.queries = 0
+
+    def armed(self, n_frames):
+        self.expected = n_frames / self.pulse_rate
+
+    def wait(self, inst, reader):
+        old_to = inst.timeout
+        inst.timeout = int((self.expected + self.slack) * 1000)
+        try:
+            self.queries += 1
+            inst.write("*OPC?")
+            reader.read_line()
+        finally:
+            inst.timeout = old_to
+
+class PredictedWait:
+    """
+    Sleep until just before the burst should be complete, then poll with backoff.
+
+    The burst length is known (n_frames pulses at pulse_rate), so there is no
+    point in querying during the first ~N/rate seconds. The estimate of
+    arm-to-stop time and its jitter are learned from previous bursts; polling
+    runs at min_poll within `guard` jitters of the estimate and doubles up to
+    max_poll once the burst is later than that.
+    """
+
+    def __init__(self, pulse_rate, min_poll=0.002, max_poll=0.02, guard=3.0, alpha=0.2):
+        self.pulse_rate = pulse_rate
+        self.min_poll = min_poll
+        self.max_poll = max_poll
+        self.guard = guard
+        self.alpha = alpha
+
+        self.n_frames = 0
+        self.t_arm = 0.0
+        self.queries = 0
+        self._extra = 1.0 / pulse_rate     # learned arm-to-stop beyond n/rate (first trigger wait, overhead)
+        self._jitter = 1.0 / pulse_rate
+
+    def armed(self, n_frames):
+        self.n_frames = n_frames
+        self.t_arm = time.perf_counter()
+
+    def predicted(self):
+        return self.n_frames / self.pulse_rate + self._extra
+
+    def wait(self, inst, reader):
+        window = self.guard * self._jitter
+        wake = self.t_arm + self.predicted() - window
+        delay = wake - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        # tight polling across the expected window, backing off once past it
+        late = wake + 2 * window
+        poll = self.min_poll
+        first = True
+        while True:
+            self.queries += 1
+            if _is_stopped(inst, reader):
+                break
+            first = False
+            time.sleep(poll)
+            if time.perf_counter() > late:
+                poll = min(poll * 2, self.max_poll)
+
+        if first:
+            # Already stopped when we woke up: we can't tell by how much we
+            # overslept, so step the estimate back instead of learning from it.
+            # never below 0: the burst can't stop before n_frames / pulse_rate
+            self._extra = max(self._extra - self._jitter, 0.0)
+        else:
+            self._learn(time.perf_counter() - self.t_arm)
+
+    def _learn(self, observed):
+        err = observed - self.predicted()
+        self._extra = max(self._extra + self.alpha * err, 0.0)
+        self._jitter += self.alpha * (abs(err) - self._jitter)
+        self._jitter = max(self._jitter, self.min_poll)
+
+def make_strategy(name, pulse_rate):
+    if name == "poll":
+        return TrigStatPoll()
+    if name == "opc":
+        return OpcWait(pulse_rate)
+    if name == "predicted":
+        return PredictedWait(pulse_rate)
+    raise ValueError(f"Unknown wait strategy: {name}")
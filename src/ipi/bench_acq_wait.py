@@ -0,0 +1,93 @@
+"""
+Benchmark: dead time of the acq_wait strategies on a simulated scope.
+
+The simulated scope completes a burst one random trigger phase plus
+n_frames / PULSE_RATE after arming, and answers queries after a network
+round trip. Dead time is the gap between the real completion and the
+moment the strategy returns. --tcp runs the same against sds_sim over a
+real socket instead (latency before every reply = rtt / 2).
+
+    python bench_acq_wait.py [--frames 50] [--bursts 10] [--rtt-ms 1.5] [--tcp]
+"""
+import argparse
+import random
+import time
+import numpy as np
+
+import acq_wait
+import sds_sim
+from scope_io import open_scope
+
+PULSE_RATE = 100
+
+class SimScope:
+    """Enough of a scope + BlockReader for acq_wait: write(), read_line(), timeout."""
+
+    def __init__(self, rtt, pulse_rate=PULSE_RATE):
+        self.rtt = rtt
+        self.pulse_rate = pulse_rate
+        self.timeout = 10000
+        self.t_done = 0.0
+        self._replies = []
+
+    def arm(self, n_frames):
+        first_trigger = random.uniform(0, 1.0 / self.pulse_rate)
+        self.t_done = time.perf_counter() + first_trigger + n_frames / self.pulse_rate
+
+    def write(self, cmd):
+        arrive = time.perf_counter() + self.rtt / 2
+        if cmd == ":TRIG:STAT?":
+            self._replies.append((arrive + self.rtt / 2, "Stop" if arrive >= self.t_done else "Ready"))
+        elif cmd == "*OPC?":
+            self._replies.append((max(arrive, self.t_done) + self.rtt / 2, "1"))
+
+    def read_line(self):
+        t_ready, line = self._replies.pop(0)
+        delay = t_ready - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return line
+
+def run(strategy, frames, bursts, rtt):
+    sim = SimScope(rtt)
+    dead = []
+    for _ in range(bursts):
+        sim.arm(frames)
+        strategy.armed(frames)
+        strategy.wait(sim, sim)
+        dead.append(time.perf_counter() - sim.t_done)
+    return np.array(dead), strategy.queries / bursts
+
+def run_tcp(strategy, frames, bursts, rtt):
+    sim = sds_sim.SdsSimulator(port=0, latency_ms=rtt / 2 * 1000, pulse_rate=PULSE_RATE).start()
+    scope, reader = open_scope(sim.resource, "socket")
+    dead = []
+    try:
+        scope.write(f":ACQuire:SEQuence ON;:ACQuire:SEQuence:COUNt {frames}")
+        for _ in range(bursts):
+            scope.write(":TRIGger:MODE SINGle")
+            strategy.armed(frames)
+            strategy.wait(scope, reader)
+            dead.append(time.time() - sim.sim.t_stop)
+    finally:
+        scope.close()
+        sim.close()
+    return np.array(dead), strategy.queries / bursts
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=50)
+    ap.add_argument("--bursts", type=int, default=10)
+    ap.add_argument("--rtt-ms", type=float, default=1.5)
+    ap.add_argument("--tcp", action="store_true", help="against sds_sim instead of the in-process model")
+    args = ap.parse_args()
+    bench = run_tcp if args.tcp else run
+
+    print(f"{args.bursts} bursts x {args.frames} frames @ {PULSE_RATE} Hz, rtt {args.rtt_ms} ms")
+    print(f"{'strategy':>10} {'dead mean ms':>13} {'dead max ms':>12} {'queries/burst':>14}")
+    for name in ("poll", "opc", "predicted"):
+        dead, q = bench(acq_wait.make_strategy(name, PULSE_RATE), args.frames, args.bursts, args.rtt_ms / 1000)
+        print(f"{name:>10} {dead.mean() * 1e3:>13.2f} {dead.max() * 1e3:>12.2f} {q:>14.1f}")
+
+if __name__ == "__main__":
+    main()
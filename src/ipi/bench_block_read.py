@@ -0,0 +1,146 @@
+"""
+Benchmark: legacy byte-by-byte block reads vs scope_io.BlockReader.
+
+Runs against a local fake SCPI socket that answers :WAV:PRE? and :WAV:DATA?
+like the SDS2000X HD does (ASCII prefix, #9 header, payload, trailing LF LF).
+
+    python bench_block_read.py [--sizes 0.1 1 5] [--reps 20]
+"""
+import argparse
+import socket
+import threading
+import time
+import numpy as np
+
+from scope_io import BlockReader
+
+DESC_LEN = 346 + 16 * 250
+
+# ---- fake scope ----
+def _serve(conn, payload, desc):
+    f = conn.makefile('rb')
+    try:
+        for line in f:
+            cmd = line.strip().upper()
+            if cmd.endswith(b"PRE?") or cmd.endswith(b"PREAMBLE?"):
+                conn.sendall(b"DESC,#9%09d" % len(desc) + desc + b"\n\n")
+            elif cmd.endswith(b"DATA?"):
+                conn.sendall(b"C1:WF DAT2,#9%09d" % len(payload) + payload + b"\n\n")
+            elif cmd == b":TRIG:STAT?":
+                conn.sendall(b"Stop\n")
+    except OSError:
+        pass    # client hung up with the trailing LF still unread
+    finally:
+        conn.close()
+
+def start_fake_scope(payload, desc):
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(4)
+
+    def accept_loop():
+        while True:
+            try:
+                conn, _ = srv.accept()
+            except OSError:
+                return
+            threading.Thread(target=_serve, args=(conn, payload, desc), daemon=True).start()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    return srv, srv.getsockname()[1]
+
+# ---- legacy path (same logic as the old read_hash_block in collect_data_bulk) ----
+class _SocketShim:
+    """Just enough of a pyvisa resource for the legacy reader: read_bytes + timeout (ms)."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.timeout = 10000
+
+    def write(self, cmd):
+        self.sock.sendall(cmd.encode() + b"\n")
+
+    def read_bytes(self, n):
+        self.sock.settimeout(self.timeout / 1000.0)
+        out = bytearray()
+        while len(out) < n:
+            chunk = self.sock.recv(n - len(out))
+            if not chunk:
+                raise ConnectionError("closed")
+            out += chunk
+        return bytes(out)
+
+def legacy_read_hash_block(inst):
+    while True:
+        b = inst.read_bytes(1)
+        if b == b'#': break
+    nd = int(inst.read_bytes(1).decode())
+    n  = int(inst.read_bytes(nd).decode())
+    payload = inst.read_bytes(n)
+    try:
+        inst.timeout = 1
+        while True:
+            c = inst.read_bytes(1)
+            if c not in (b'\r', b'\n'): break
+    except (socket.timeout, TimeoutError):
+        pass
+    finally:
+        inst.timeout = 10000
+    return payload
+
+# ---- runs ----
+def _connect(port):
+    s = socket.create_connection(("127.0.0.1", port))
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return s
+
+def bench_legacy(port, reps):
+    shim = _SocketShim(_connect(port))
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        shim.write(":WAV:PRE?")
+        desc = legacy_read_hash_block(shim)
+        shim.write(":WAV:DATA?")
+        data = legacy_read_hash_block(shim)
+        np.frombuffer(data, dtype="<u2").copy()
+        times.append(time.perf_counter() - t0)
+    shim.sock.close()
+    return times, len(data)
+
+def bench_reader(port, reps):
+    sock = _connect(port)
+    reader = BlockReader(sock, size=1 << 20)
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        sock.sendall(b":WAV:PRE?\n")
+        desc = bytes(reader.read_block())
+        sock.sendall(b":WAV:DATA?\n")
+        data = reader.read_block()
+        np.frombuffer(data, dtype="<u2")
+        times.append(time.perf_counter() - t0)
+    sock.close()
+    return times, len(data)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=float, nargs="+", default=[0.1, 1.0, 5.0], help="payload sizes in MB")
+    ap.add_argument("--reps", type=int, default=20)
+    args = ap.parse_args()
+
+    desc = bytes(DESC_LEN)
+    print(f"{'payload':>10} {'reader':>8} {'median ms':>10} {'MB/s':>9}")
+    for mb in args.sizes:
+        payload = np.random.default_rng(0).integers(0, 256, int(mb * 1e6), dtype=np.uint8).tobytes()
+        srv, port = start_fake_scope(payload, desc)
+        try:
+            for name, fn in (("legacy", bench_legacy), ("block", bench_reader)):
+                times, n = fn(port, args.reps)
+                med = float(np.median(times))
+                print(f"{mb:>8.2f}MB {name:>8} {med * 1e3:>10.2f} {n / med / 1e6:>9.1f}")
+        finally:
+            srv.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: lossless snapshot compression (frame_codec), per codec, level,
+delta encoding and thread count. Reports the ratio and the raw MB/s going in
+(encode) and coming out (decode), on synthetic bursts or the codes of a
+recorded .snap.
+
+    python bench_compression.py [--frames 1000] [--points 10000] [--snap FILE]
+                                [--codecs zlib lzma] [--threads 1 4] [--reps 3]
+"""
+import argparse
+import concurrent.futures
+import os
+import time
+import numpy as np
+
+import frame_codec
+import snapshot_file
+import wavedesc
+from bench_pipeline import make_burst
+
+def timed(fn, reps):
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), out
+
+def bench(label, codes, args):
+    print(f"{label}: {codes.shape[0]} frames x {codes.shape[1]} points {codes.dtype}, {codes.nbytes / 1e6:.1f} MB")
+    print(f"{'codec':>6} {'level':>5} {'delta':>5} {'threads':>7} {'ratio':>6} {'enc MB/s':>9} {'dec MB/s':>9}")
+    for codec in args.codecs:
+        for level in args.levels.get(codec, [frame_codec.LEVELS[codec]]):
+            for use_delta in (True, False):
+                for threads in args.threads:
+                    with concurrent.futures.ThreadPoolExecutor(threads) as workers:
+                        enc_s, chunks = timed(lambda: frame_codec.encode_chunks(codes, codec, level, args.chunk_frames,
+                                                                                workers, use_delta), args.reps)
+                        blobs = [blob for _, blob in chunks]
+                        dec_s, out = timed(lambda: frame_codec.decode_chunks(blobs, codec, codes.dtype, codes.shape[1],
+                                                                             workers, use_delta), args.reps)
+                        assert np.array_equal(np.vstack(out), codes)
+                    ratio = codes.nbytes / sum(len(b) for b in blobs)
+                    print(f"{codec:>6} {level:>5} {'yes' if use_delta else 'no':>5} {threads:>7} {ratio:>6.2f} "
+                          f"{codes.nbytes / enc_s / 1e6:>9.1f} {codes.nbytes / dec_s / 1e6:>9.1f}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=1000)
+    ap.add_argument("--points", type=int, default=10000)
+    ap.add_argument("--snap", help="benchmark the codes of this .snap instead of synthetic bursts")
+    ap.add_argument("--codecs", nargs="+", default=frame_codec.available(), choices=list(frame_codec.LEVELS))
+    ap.add_argument("--threads", nargs="+", type=int, default=sorted({1, os.cpu_count() or 1}))
+    ap.add_argument("--chunk-frames", type=int, default=frame_codec.CHUNK_FRAMES)
+    ap.add_argument("--reps", type=int, default=3)
+    args = ap.parse_args()
+    args.levels = {"zlib": [1, 6], "lzma": [0], "zstd": [1, 3, 9]}
+
+    if args.snap:
+        bench(args.snap, np.asarray(snapshot_file.SnapshotFile(args.snap).codes[:]), args)
+        return
+    rng = np.random.default_rng(0)
+    for width in ("WORD", "BYTE"):
+        desc, data = make_burst(width, args.frames, args.points, rng)
+        bench(width, wavedesc.codes(wavedesc.parse(desc), data).reshape(args.frames, args.points), args)
+
+if __name__ == "__main__":
+    main()
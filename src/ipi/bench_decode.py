@@ -0,0 +1,77 @@
+"""
+Benchmark: DATA? payload -> volts, per decode path.
+
+  python_loop   the per-sample loops sds_readseq / chopper_sync3 used (timed on
+                the first --loop-samples samples, scaled to the whole burst)
+  arithmetic    wavedesc.volts(wd, wavedesc.codes(wd, data)): shift, scale, offset
+  lut           wavedesc.decode_volts, new float64 output every call
+  lut_reuse     wavedesc.decode_volts into one reused float64 buffer
+  lut_f32       the same into a reused float32 buffer
+
+    python bench_decode.py [--frames 250] [--points 10000] [--widths WORD BYTE] [--reps 5]
+"""
+import argparse
+import time
+import numpy as np
+
+import wavedesc
+from bench_pipeline import make_burst
+
+def python_loop(data, word, adc_bit, code, vdiv, ofst):
+    recv = list(data)
+    convert_data = []
+    if word:
+        for i in range(0, int(len(recv) / 2)):
+            convert_data.append((recv[2 * i + 1] * 256 + recv[2 * i]) >> (16 - adc_bit))
+    else:
+        convert_data = recv
+    volt_value = []
+    for d in convert_data:
+        if d > pow(2, adc_bit - 1) - 1:
+            d = d - pow(2, adc_bit)
+        volt_value.append(d / code * vdiv - ofst)
+    return volt_value
+
+def timed(fn, reps):
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=250)
+    ap.add_argument("--points", type=int, default=10000)
+    ap.add_argument("--widths", nargs="+", default=["WORD", "BYTE"], choices=["WORD", "BYTE"])
+    ap.add_argument("--reps", type=int, default=5)
+    ap.add_argument("--loop-samples", type=int, default=200_000)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{args.frames} frames x {args.points} points")
+    print(f"{'width':>5} {'path':>12} {'ms':>10} {'Msamples/s':>11} {'vs arith':>9}")
+    for width in args.widths:
+        desc, data = make_burst(width, args.frames, args.points, rng)
+        wd = wavedesc.parse(desc)
+        word = wd.width == 1
+        n = len(data) // (2 if word else 1)
+        ref = wavedesc.volts(wd, wavedesc.codes(wd, data))
+        assert np.array_equal(wavedesc.decode_volts(wd, data), ref)
+
+        buf64, buf32 = np.empty(n), np.empty(n, dtype=np.float32)
+        part = data[:args.loop_samples * (2 if word else 1)]
+        loop_s = timed(lambda: python_loop(part, word, wd.bits, wd.code_per_div, wd.vdiv, wd.voff), 1)
+        paths = {
+            "python_loop": loop_s * len(data) / len(part),
+            "arithmetic": timed(lambda: wavedesc.volts(wd, wavedesc.codes(wd, data)), args.reps),
+            "lut": timed(lambda: wavedesc.decode_volts(wd, data), args.reps),
+            "lut_reuse": timed(lambda: wavedesc.decode_volts(wd, data, out=buf64), args.reps),
+            "lut_f32": timed(lambda: wavedesc.decode_volts(wd, data, out=buf32), args.reps),
+        }
+        for path, sec in paths.items():
+            print(f"{width:>5} {path:>12} {sec * 1e3:>10.3f} {n / sec / 1e6:>11.1f} {paths['arithmetic'] / sec:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
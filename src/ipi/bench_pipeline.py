@@ -0,0 +1,190 @@
+"""
+Benchmark: frames/s and MB/s of every acquisition stage, on synthetic bursts.
+
+Stages, each timed on its own with the code collect_data_bulk runs:
+  block_read    PREamble? + DATA? from the fake scope (bench_block_read), BlockReader
+  preamble      wavedesc.parse
+  decode        burst_records.decode_sequence_waveforms (includes the timestamps)
+  decode_lazy   the same with lazy=True: codes kept as ScaledCodes, no volts
+  timestamps    wavedesc.frame_epochs_ns
+  segment       segment_writer.SegmentWriter: add_burst of a window of --window bursts,
+                then close(), so the writer thread has written them all (one segment)
+  snap_save     the same window through snapshot_file.SnapshotWriter alone (snapshot_*.snap)
+  snap_load     snapshot_file.load_compat of that file back to (t, v) rows
+MB/s is DATA? payload bytes over the stage time. Every run appends one JSON line
+(commit, host, parameters, per-stage numbers) to --out and is compared with the
+last earlier run there with the same parameters.
+
+    python bench_pipeline.py [--frames 250] [--points 10000] [--widths WORD BYTE] [--reps 3]
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+import wavedesc
+import burst_records
+import segment_writer
+import snapshot_file
+from bench_block_read import start_fake_scope
+from scope_io import BlockReader
+
+PULSE_RATE = 100
+
+def make_burst(width, frames, points, rng):
+    """(desc, data) of a burst like the scope sends it: one pulse per frame, realistic timestamps."""
+    word = width == "WORD"
+    wd = wavedesc.WaveDesc(width=int(word), order=0, data_bytes=frames * points * (2 if word else 1),
+                           one_frame_pts=points, first_point=0, sparsing=1, read_frame=frames,
+                           sum_frame=frames, v_scale=0.5, v_offset=0.0, code_raw=25 * 256, adc_bit=12,
+                           sn=0, interval=5e-9, delay=0.0, tdiv_index=15, probe=1.0)
+    t0 = time.time_ns()
+    epochs = t0 + np.arange(frames, dtype=np.int64) * int(1e9 / PULSE_RATE)
+    desc = wavedesc.pack(wd, wavedesc.timestamp_table(epochs))
+
+    shape = np.exp(-0.5 * ((np.arange(points) - 0.3 * points) / 4.0) ** 2)
+    codes = 240 * shape + 2 * rng.standard_normal((frames, points))
+    codes = np.clip(np.rint(codes), -2048, 2047).astype(np.int16)
+    data = (codes << 4).astype("<i2").tobytes() if word else (codes >> 4).astype(np.int8).tobytes()
+    return desc, data
+
+def timed(fn, reps):
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)), out
+
+def bench_width(width, args, rng, workdir):
+    desc, data = make_burst(width, args.frames, args.points, rng)
+    results = {}
+
+    def record(stage, seconds, frames, n_bytes):
+        results[stage] = {"seconds": seconds, "frames_per_s": frames / seconds, "mb_per_s": n_bytes / seconds / 1e6}
+
+    # block read
+    srv, port = start_fake_scope(data, desc)
+    try:
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        reader = BlockReader(sock, size=len(data))
+
+        def read():
+            sock.sendall(b":WAV:PRE?\n")
+            bytes(reader.read_block())
+            sock.sendall(b":WAV:DATA?\n")
+            return reader.read_block()
+
+        sec, _ = timed(read, args.reps)
+        sock.close()
+    finally:
+        srv.close()
+    record("block_read", sec, args.frames, len(data))
+
+    # per-burst stages, repeated enough to time
+    inner = 200
+    sec, _ = timed(lambda: [wavedesc.parse(desc) for _ in range(inner)], args.reps)
+    record("preamble", sec / inner, args.frames, len(data))
+
+    sec, _ = timed(lambda: burst_records.decode_sequence_waveforms(desc, data, 1), args.reps)
+    record("decode", sec, args.frames, len(data))
+
+    sec, _ = timed(lambda: burst_records.decode_sequence_waveforms(desc, data, 1, lazy=True), args.reps)
+    record("decode_lazy", sec, args.frames, len(data))
+
+    sec, _ = timed(lambda: [wavedesc.frame_epochs_ns(desc, args.frames) for _ in range(inner)], args.reps)
+    record("timestamps", sec / inner, args.frames, len(data))
+
+    # one window of bursts
+    t, burst, meta, epochs = burst_records.decode_sequence_waveforms(desc, data, 1, lazy=True)
+    n_frames, n_bytes = args.frames * args.window, len(data) * args.window
+    runs = iter(range(args.reps))
+
+    def write_segment():
+        folder = os.path.join(workdir, f"segments_{width}_{next(runs)}")
+        os.makedirs(folder)
+        segments = segment_writer.SegmentWriter(folder, {"pulse_rate": PULSE_RATE})
+        for i in range(args.window):
+            segments.add_burst(t, burst, meta, epochs + i * args.frames * int(1e9 / PULSE_RATE))
+        segments.close()
+        return folder
+
+    sec, folder = timed(write_segment, args.reps)
+    record("segment", sec, n_frames, n_bytes)
+    results["segment"]["file_mb"] = sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder)) / 1e6
+
+    path = os.path.join(workdir, f"snapshot_{width}.snap")
+
+    def save_snap():
+        with snapshot_file.SnapshotWriter(path) as writer:
+            for i in range(args.window):
+                writer.add_burst(t, burst, epochs + i * args.frames * int(1e9 / PULSE_RATE))
+
+    sec, _ = timed(save_snap, args.reps)
+    record("snap_save", sec, n_frames, n_bytes)
+    results["snap_save"]["file_mb"] = os.path.getsize(path) / 1e6
+
+    sec, _ = timed(lambda: snapshot_file.load_compat(path), args.reps)
+    record("snap_load", sec, n_frames, n_bytes)
+    return results
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def _previous(path, run):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    same = [r for r in runs if r.get("params") == run["params"] and r.get("host") == run["host"]]
+    return same[-1] if same else None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=250)
+    ap.add_argument("--points", type=int, default=10000)
+    ap.add_argument("--widths", nargs="+", default=["WORD", "BYTE"], choices=["WORD", "BYTE"])
+    ap.add_argument("--window", type=int, default=2, help="bursts per assembled/saved snapshot")
+    ap.add_argument("--reps", type=int, default=3)
+    ap.add_argument("--out", default="bench_pipeline.jsonl")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    run = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": _commit(), "host": platform.node(),
+           "python": platform.python_version(), "numpy": np.__version__,
+           "params": {k: v for k, v in vars(args).items() if k != "out"}, "stages": {}}
+
+    print(f"{args.frames} frames x {args.points} points, window of {args.window} bursts")
+    print(f"{'width':>5} {'stage':>11} {'ms':>10} {'frames/s':>12} {'MB/s':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for width in args.widths:
+            stages = bench_width(width, args, rng, workdir)
+            run["stages"][width] = stages
+            for stage, r in stages.items():
+                print(f"{width:>5} {stage:>11} {r['seconds'] * 1e3:>10.3f} {r['frames_per_s']:>12.0f} {r['mb_per_s']:>9.1f}")
+
+    previous = _previous(args.out, run)
+    with open(args.out, "a") as f:
+        f.write(json.dumps(run) + "\n")
+    print(f"Appended to {args.out}")
+
+    if previous:
+        print(f"\nframes/s vs {previous['commit']} ({previous['time']}):")
+        for width, stages in run["stages"].items():
+            for stage, r in stages.items():
+                old = previous["stages"].get(width, {}).get(stage)
+                if old:
+                    print(f"{width:>5} {stage:>11} {r['frames_per_s'] / old['frames_per_s']:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Check + benchmark: seq_stream.iter_sequence_frames against sds_sim.
+
+Captures --frames sequence frames on the simulator, streams them with
+iter_sequence_frames (several reads when --max-read-points is small), and
+checks every yielded frame against the same frame read on its own with
+:WAVeform:SEQuence <frame>,0, then reports the streaming rate.
+
+    python bench_seq_stream.py [--frames 10] [--points 1000] [--max-read-points 3000] [--mbps 0]
+"""
+import argparse
+import time
+import numpy as np
+
+import sds_sim
+import wavedesc
+from scope_io import open_scope
+from seq_stream import iter_sequence_frames
+
+def read_frame(scope, reader, frame, interval):
+    """(t, volts) of one sequence frame, read on its own."""
+    scope.write(f":WAVeform:SOURce C1;:WAVeform:SEQuence {frame},0")
+    scope.write(":WAVeform:PREamble?")
+    scope.write(":WAVeform:DATA?")
+    desc = bytes(reader.read_block())
+    data = bytes(reader.read_block())
+    wd = wavedesc.parse(desc)
+    V = wavedesc.volts(wd, wavedesc.codes(wd, data)).reshape(-1)
+    return wavedesc.time_axis(wd, len(V), interval), V
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=10)
+    ap.add_argument("--points", type=int, default=1000)
+    ap.add_argument("--max-read-points", type=int, default=3000)
+    ap.add_argument("--mbps", type=float, default=0.0)
+    args = ap.parse_args()
+
+    sim = sds_sim.SdsSimulator(0, mbps=args.mbps, latency_ms=0.0, points=args.points, arm_ms=0.0,
+                               max_read_points=args.max_read_points).start()
+    scope, reader = open_scope(sim.resource, transport="socket", count=4)
+    try:
+        scope.write(f":ACQuire:SEQuence ON;:ACQuire:SEQuence:COUNt {args.frames};:TRIGger:MODE SINGle;:TRIGger:RUN")
+        time.sleep(args.frames * sim.sim.period + 0.1)   # the sequence completes
+
+        t0 = time.perf_counter()
+        streamed = [(frame, t, np.array(V)) for frame, t, V in iter_sequence_frames(scope, "C1", reader)]
+        sec = time.perf_counter() - t0
+
+        interval = int(float(scope.query(":WAVeform:INTerval?")))
+        labels = [frame for frame, _, _ in streamed]
+        assert labels == list(range(1, args.frames + 1)), labels
+        for frame, t, V in streamed:
+            t_one, V_one = read_frame(scope, reader, frame, interval)
+            assert np.array_equal(V, V_one), f"frame {frame} doesn't match its single-frame read"
+            assert np.array_equal(t, t_one)
+        per_read = max(args.max_read_points // args.points, 1)
+        print(f"{args.frames} frames x {args.points} points in {-(-args.frames // per_read)} reads: "
+              f"every frame matches its label, {args.frames / sec:.0f} frames/s")
+    finally:
+        scope.close()
+        sim.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: every :WAV:WIDTh / :WAV:INTerval combination transfer_plan chooses
+from, read from the fake scope (bench_block_read) and decoded as collect_data_bulk
+does. Next to the link model's pulses/s and resolution cost it shows what the
+host side manages for the same bursts: the host has to keep up with the link
+at whatever setting the plan picks.
+
+    python bench_transfer_plan.py [--points 20000] [--frames 250] [--reps 5] [--link 8]
+"""
+import argparse
+import dataclasses
+import socket
+import time
+import numpy as np
+
+import transfer_plan
+import wavedesc
+from bench_block_read import start_fake_scope
+from scope_io import BlockReader
+
+def make_burst(p, wd, frames, rng):
+    n_bytes = p.points * frames * transfer_plan.WIDTHS[p.width]
+    wd = dataclasses.replace(wd, width=0 if p.width == "BYTE" else 1, data_bytes=n_bytes,
+                             read_frame=frames, sum_frame=frames)
+    desc = wavedesc.pack(wd, bytes(wavedesc.TIMESTAMP_DTYPE.itemsize * frames))
+    if p.width == "BYTE":
+        data = rng.integers(-128, 128, p.points * frames, dtype=np.int8).tobytes()
+    else:
+        data = (rng.integers(-2048, 2048, p.points * frames, dtype=np.int16) << 4).astype("<i2").tobytes()
+    return desc, data
+
+def bench(port, reps, points, interval):
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    reader = BlockReader(sock, size=1 << 20)
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        sock.sendall(b":WAV:PRE?\n")
+        desc = bytes(reader.read_block())
+        sock.sendall(b":WAV:DATA?\n")
+        data = reader.read_block()
+        wd = wavedesc.parse(desc)
+        V = wavedesc.volts(wd, wavedesc.codes(wd, data))
+        wavedesc.time_axis(wd, points, interval, zero_start=True)
+        wavedesc.frame_epochs_ns(desc, wd.read_frame)
+        times.append(time.perf_counter() - t0)
+    sock.close()
+    assert V.shape[1] == points
+    return float(np.median(times)), len(data)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--points", type=int, default=20000, help="points per frame at :WAV:INT 1")
+    ap.add_argument("--frames", type=int, default=250)
+    ap.add_argument("--reps", type=int, default=5)
+    ap.add_argument("--link", type=float, default=transfer_plan.LINK_BYTES_PER_S / 1e6, help="link MB/s for the model")
+    args = ap.parse_args()
+
+    wd = wavedesc.WaveDesc(width=1, order=0, data_bytes=0, one_frame_pts=args.points, first_point=0,
+                           sparsing=1, read_frame=1, sum_frame=1, v_scale=0.5, v_offset=0.0,
+                           code_raw=25 * 256, adc_bit=12, sn=0, interval=0.5e-9,
+                           delay=0.0, tdiv_index=0, probe=1.0)
+    rng = np.random.default_rng(0)
+
+    print(f"{'width':>5} {'int':>4} {'B/frame':>8} {'link pulses/s':>14} {'dt ns':>7} {'LSB mV':>7} "
+          f"{'noise uV':>9} {'host ms':>8} {'host MB/s':>10} {'host frames/s':>14}")
+    for p in transfer_plan.candidates(wd, args.link * 1e6):
+        desc, data = make_burst(p, wd, args.frames, rng)
+        srv, port = start_fake_scope(data, desc)
+        try:
+            med, n = bench(port, args.reps, p.points, p.interval)
+        finally:
+            srv.close()
+        print(f"{p.width:>5} {p.interval:>4} {p.bytes_per_frame:>8} {p.pulses_per_s:>14.1f} {p.dt * 1e9:>7.2f} "
+              f"{p.lsb_v * 1e3:>7.3f} {p.mean_noise_v * 1e6:>9.3f} {med * 1e3:>8.2f} {n / med / 1e6:>10.1f} "
+              f"{args.frames / med:>14.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Client side of scope_broker: the wire format and BrokerScope.
+
+Messages in both directions are <u32 header length><u32 payload length>, a
+JSON header, then the payload. A request header is {"prio": p, "ops": [[kind,
+cmd], ...]} with kind "w" (write), "q" (query, one line back), "b" (query, one
+block back) or "c" (device clear); the broker runs all ops of one request
+back-to-back on the scope. The reply header is {"results": [...], "blocks":
+[len, ...], "error": msg or null}; block results are indexes into "blocks", whose
+payloads follow the header in order.
+"""
+import collections
+import json
+import socket
+import struct
+
+BROKER_HOST = "127.0.0.1"
+BROKER_PORT = 11790
+
+PRIO_POLL = 0       # short measurement queries
+PRIO_BULK = 10      # waveform transfers
+
+_LENGTHS = struct.Struct("<II")
+
+def send_msg(sock, header, payloads=()):
+    head = json.dumps(header).encode("utf-8")
+    sock.sendall(_LENGTHS.pack(len(head), sum(len(p) for p in payloads)) + head)
+    for p in payloads:
+        sock.sendall(p)
+
+def recv_msg(sock):
+    """(header dict, payload memoryview); None when the peer closed the connection."""
+    lengths = _recv_exact(sock, _LENGTHS.size)
+    if lengths is None:
+        return None
+    n_head, n_payload = _LENGTHS.unpack(lengths)
+    head = _recv_exact(sock, n_head)
+    payload = _recv_exact(sock, n_payload)
+    if head is None or payload is None:
+        raise ConnectionError("connection closed mid-message")
+    return json.loads(bytes(head)), memoryview(payload)
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        r = sock.recv_into(view[got:])
+        if r == 0:
+            return None
+        got += r
+    return buf
+
+class BrokerScope:
+    """
+    Scope + reader facade over a scope_broker connection, same surface as
+    scope_async.SocketScope. Get one through scope_io.open_scope(..., transport="broker").
+
+    write() of a plain command is sent right away (its acknowledgement is
+    collected later). A query is held until read_line()/read_block() says what
+    kind of answer it expects and then goes out as one job, so
+    ":WAV:SOUR C1;:WAV:PRE?" style compound queries run atomically on the scope.
+    Use transaction() to run several commands as one job. Jobs go out at
+    `priority` (lower runs first).
+    """
+
+    def __init__(self, host=BROKER_HOST, port=BROKER_PORT, timeout=10000, priority=PRIO_BULK):
+        self._sock = socket.create_connection((host, port), timeout / 1000.0)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.priority = priority
+        self._timeout = timeout
+        self._unacked = 0
+        self._queries = collections.deque()
+        # accepted for pyvisa compatibility, the broker owns the real settings
+        self.write_termination = '\n'
+        self.read_termination = None
+        self.chunk_size = 1 << 20
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, ms):
+        # covers queueing behind other clients' jobs as well as the scope itself
+        self._timeout = ms
+        self._sock.settimeout(ms / 1000.0)
+
+    def transaction(self, ops, priority=None):
+        """Run [(kind, cmd), ...] as one job; returns one result per op (None for writes)."""
+        self._collect_acks()
+        send_msg(self._sock, {"prio": self.priority if priority is None else priority,
+                              "ops": [list(op) for op in ops]})
+        return self._reply()
+
+    def write(self, cmd):
+        if "?" in cmd:
+            self._queries.append(cmd)
+            return
+        send_msg(self._sock, {"prio": self.priority, "ops": [["w", cmd]]})
+        self._unacked += 1
+
+    def query(self, cmd):
+        return self.transaction([("q", cmd)])[0]
+
+    def query_many(self, cmds):
+        return self.transaction([("q", c) for c in cmds])
+
+    def read_line(self):
+        return self.transaction([("q", self._next_query())])[0]
+
+    def read_block(self):
+        return self.transaction([("b", self._next_query())])[0]
+
+    def clear(self):
+        self._queries.clear()
+        while self._unacked:
+            try:
+                self._collect_acks()
+            except IOError:
+                pass
+        self.transaction([("c", "")])
+
+    def close(self):
+        try:
+            self._collect_acks()
+        finally:
+            self._sock.close()
+
+    def _next_query(self):
+        if not self._queries:
+            raise IOError("read without a pending query")
+        return self._queries.popleft()
+
+    def _collect_acks(self):
+        while self._unacked:
+            self._unacked -= 1
+            self._reply()
+
+    def _reply(self):
+        msg = recv_msg(self._sock)
+        if msg is None:
+            raise ConnectionError("broker closed the connection")
+        header, payload = msg
+        if header.get("error"):
+            raise IOError(f"broker: {header['error']}")
+        offsets = [0]
+        for n in header["blocks"]:
+            offsets.append(offsets[-1] + n)
+        return [payload[offsets[r]:offsets[r + 1]] if isinstance(r, int) else r for r in header["results"]]
@@ -0,0 +1,147 @@
+"""
+Burst size control for sequence captures (:ACQ:SEQuence:COUNt).
+
+A burst of N segments is N / pulse_rate of live time. Around it is dead time:
+arm-to-stop beyond N / pulse_rate (arming, waiting for the first trigger,
+detecting the stop) and everything between the stop and the next arm
+(transfer, plus decode in the serial loop). The controller fits that dead time
+against N over the last bursts and, before every arm, picks the N that captures
+the largest fraction of pulses while the burst's DATA? payload stays under
+max_bytes.
+
+Call next_size() right before arming, stopped() when the burst is done and
+transferred(n_bytes) once DATA? is in. Every decision goes to a CSV log (one row
+per burst) so runs can be compared.
+"""
+import collections
+import csv
+import time
+import numpy as np
+
+LOG_FIELDS = [
+    "time", "n", "arm_to_stop_s", "transfer_s", "stop_to_arm_s", "bytes", "capture",
+    "overhead_s", "fixed_s", "per_frame_s", "ceiling", "predicted", "next_n", "reason",
+]
+
+class BurstSizeController:
+    """
+    n_min / n_max bound the segment count (n_max: what the scope's sequence
+    memory allows at the current settings). Among the sizes under the
+    ceiling, the smallest one within `tolerance` of the best predicted capture
+    fraction is used: longer bursts only add latency and lose more on a failed
+    read once the curve has flattened. Growth is limited to `max_growth` per
+    burst so the fit sees a spread of sizes; shrinking is immediate.
+    """
+
+    def __init__(self, pulse_rate, n_start=250, n_min=10, n_max=5000, max_bytes=256 << 20,
+                 tolerance=0.005, max_growth=2.0, history=20, alpha=0.2, log_path=None):
+        self.pulse_rate = pulse_rate
+        self.n_min = n_min
+        self.n_max = max(n_max, n_min)
+        self.max_bytes = max_bytes
+        self.tolerance = tolerance
+        self.max_growth = max_growth
+        self.alpha = alpha
+
+        self.n = min(max(n_start, self.n_min), self.n_max)
+        self.capture = None              # measured capture fraction of the last burst
+        self._samples = collections.deque(maxlen=history)     # (n, stop_to_arm_s)
+        self._overhead = None            # arm-to-stop beyond n / pulse_rate, smoothed
+        self._bytes_per_frame = None
+        self._t_arm = None
+        self._t_stop = None
+        self._t_read = None
+        self._bytes = None
+
+        self._log = None
+        if log_path:
+            self._log = open(log_path, "w", newline="")
+            self._writer = csv.writer(self._log)
+            self._writer.writerow(LOG_FIELDS)
+
+    # ---- timing hooks ----
+    def next_size(self):
+        """Close out the previous burst, decide, and return N for the burst about to be armed."""
+        now = time.perf_counter()
+        if self._t_arm is not None:
+            self._close_burst(now)
+        self._t_arm = now
+        self._t_stop = self._t_read = self._bytes = None
+        return self.n
+
+    def stopped(self):
+        self._t_stop = time.perf_counter()
+
+    def transferred(self, n_bytes):
+        self._t_read = time.perf_counter()
+        self._bytes = n_bytes
+
+    def close(self):
+        if self._log:
+            self._log.close()
+            self._log = None
+
+    # ---- model ----
+    def predicted(self, n, fixed, per_frame):
+        live = np.asarray(n, dtype=np.float64) / self.pulse_rate
+        return live / (live + self._overhead + fixed + per_frame * np.asarray(n))
+
+    def _fit(self):
+        ns = np.array([s[0] for s in self._samples], dtype=np.float64)
+        ds = np.array([s[1] for s in self._samples])
+        if len(np.unique(ns)) >= 2:
+            per_frame, fixed = np.polyfit(ns, ds, 1)
+            return max(fixed, 0.0), max(per_frame, 0.0)
+        # one size seen so far: charge it all per frame, the conservative guess
+        return 0.0, float(np.mean(ds / ns))
+
+    def _ceiling(self):
+        n = self.n_max
+        if self._bytes_per_frame:
+            n = min(n, int(self.max_bytes // self._bytes_per_frame))
+        return max(n, self.n_min)
+
+    def _choose(self, fixed, per_frame, ceiling):
+        sizes = np.unique(np.linspace(self.n_min, ceiling, 64).astype(int))
+        f = self.predicted(sizes, fixed, per_frame)
+        target = int(sizes[np.argmax(f >= f.max() - self.tolerance)])
+
+        if target > self.n * self.max_growth:
+            return int(self.n * self.max_growth), "growth-limited"
+        if target > self.n:
+            return target, "grow"
+        if target < self.n:
+            return target, "ceiling" if self.n > ceiling else "shrink"
+        return target, "hold"
+
+    def _close_burst(self, now):
+        n = self.n
+        if self._t_stop is None or self._t_read is None:
+            # failed wait or read: nothing to learn from, keep N
+            self._write([now, n, "", "", "", "", "", "", "", "", "", "", n, "error"])
+            return
+
+        live = n / self.pulse_rate
+        arm_to_stop = self._t_stop - self._t_arm
+        transfer = self._t_read - self._t_stop
+        stop_to_arm = now - self._t_stop
+        overhead = max(arm_to_stop - live, 0.0)
+        self.capture = live / (live + overhead + stop_to_arm)
+
+        self._overhead = overhead if self._overhead is None else \
+            self._overhead + self.alpha * (overhead - self._overhead)
+        self._bytes_per_frame = self._bytes / n
+        self._samples.append((n, stop_to_arm))
+
+        fixed, per_frame = self._fit()
+        ceiling = self._ceiling()
+        next_n, reason = self._choose(fixed, per_frame, ceiling)
+        self._write([now, n, f"{arm_to_stop:.6f}", f"{transfer:.6f}", f"{stop_to_arm:.6f}", self._bytes,
+                     f"{self.capture:.5f}", f"{self._overhead:.6f}", f"{fixed:.6f}", f"{per_frame:.3e}",
+                     ceiling, f"{float(self.predicted(next_n, fixed, per_frame)):.5f}", next_n, reason])
+        self.n = next_n
+
+    def _write(self, row):
+        if self._log:
+            self._writer.writerow(row)
+            self._log.flush()
@@ -0,0 +1,131 @@
+"""
+Sequence bursts -> ADC codes and volts: the decode step of collect_data_bulk,
+kept free of scope and run state so bench_pipeline can time exactly the code
+the acquisition runs.
+"""
+import numpy as np
+
+import wavedesc
+
+def decode_sequence_codes(desc: bytes, datablock: bytes, wav_int = 100, roi = None):
+    """
+    Given one WAVEDESC (desc) and one DATA? payload (data)
+    from SDS2000X HD in sequence mode, return:
+        t: (n_pts,) time axis [s], 0 at the start of the whole frame (also for
+           a roi transfer), shared between bursts
+        codes: (n_frames, n_pts) signed ADC codes, int8 (BYTE) or int16 (WORD),
+           V = codes * meta["volts_per_code"] - meta["voff"]
+        meta: dict of preamble fields
+        epochs: (n_frames,) int64 epoch ns of every frame
+    """
+    wd = wavedesc.parse(desc)
+
+    # Export decimation
+    N = int(wav_int) if wav_int and wav_int > 0 else 1
+    full_pts = wavedesc.transferred_points(wd, N)
+    read_pts = roi.points if roi else full_pts
+
+    # ---- sanity: expected byte length ----
+    expected_bytes = read_pts * wd.read_frame * (1 if wd.width == 0 else 2)
+    if len(datablock) != expected_bytes:
+        # If this trips: preamble / read_pts / read_frame mismatch.
+        # That will absolutely cause cloned frames.
+        raise ValueError(
+            f"Length mismatch: got {len(datablock)} bytes, "
+            f"expected {expected_bytes} for {wd.read_frame}x{read_pts}"
+        )
+
+    c = wavedesc.codes(wd, datablock)
+    t = wavedesc.time_axis(wd, full_pts, N, zero_start=True)
+    if roi:
+        t = roi.time_axis(t)
+
+    meta = wd.as_dict()
+    meta.update({
+        "adc_bits": wd.bits,
+        "code_per_div_eff": wd.code_per_div,
+        "dt_eff": wd.interval * N,
+        "volts_per_code": wd.volts_per_code,
+        "voff": wd.voff,
+        "roi": roi.as_dict() if roi else None,
+    })
+
+    return t, c, meta, wavedesc.frame_epochs_ns(desc, wd.read_frame)
+
+def decode_sequence_waveforms(desc: bytes, datablock: bytes, wav_int = 100, roi = None, lazy = False):
+    """
+    decode_sequence_codes with the codes scaled to voltages V (n_frames, n_pts) [V],
+    or with lazy, the codes kept as they are in a ScaledCodes (2 or 1 bytes a sample
+    instead of 8).
+    """
+    t, c, meta, epochs = decode_sequence_codes(desc, datablock, wav_int, roi)
+    burst = ScaledCodes(c, meta["volts_per_code"], meta["voff"])
+    return t, burst if lazy else burst.volts(), meta, epochs
+
+class ScaledCodes:
+    """
+    ADC codes (n_frames, n_pts) with V = codes * scale - offset, where scale and
+    offset are per burst (scalars) or per frame ((n_frames,) arrays, as a
+    snapshot file holds them). Volts are only made on access (volts(), or
+    indexing a single frame); the per-frame reductions work on the codes and
+    scale the (n_frames,) result instead.
+    """
+    __slots__ = ("codes", "scale", "offset")
+
+    def __init__(self, codes, scale, offset):
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+    def __getitem__(self, frames):
+        if isinstance(frames, (int, np.integer)):
+            return self.codes[frames] * self._at(self.scale, frames) - self._at(self.offset, frames)
+        return ScaledCodes(self.codes[frames], self._at(self.scale, frames), self._at(self.offset, frames))
+
+    @staticmethod
+    def _at(x, frames):
+        return x if np.ndim(x) == 0 else x[frames]
+
+    def _col(self, x):
+        return x if np.ndim(x) == 0 else np.asarray(x)[:, None]
+
+    def volts(self, dtype=np.float64):
+        return (self.codes * self._col(self.scale) - self._col(self.offset)).astype(dtype, copy=False)
+
+    def peak(self):
+        """Per-frame maximum [V]."""
+        hi = self.codes.max(axis=1) * self.scale
+        if np.any(np.asarray(self.scale) < 0):     # inverted scaling: the highest volts are the lowest codes
+            hi = np.maximum(hi, self.codes.min(axis=1) * self.scale)
+        return hi - self.offset
+
+    def sum(self, points=slice(None)):
+        """Per-frame sum of the volts over points [V]."""
+        c = self.codes[:, points]
+        return c.sum(axis=1, dtype=np.int64) * self.scale - self.offset * c.shape[1]
+
+    def mean(self, points=slice(None)):
+        """Per-frame mean [V] over points, e.g. the baseline before the pulse."""
+        c = self.codes[:, points]
+        return c.sum(axis=1, dtype=np.int64) / c.shape[1] * self.scale - self.offset
+
+    def trapezoid(self):
+        """Per-frame np.trapezoid of the volts, unit spacing [V * samples]."""
+        c = self.codes
+        inner = c.sum(axis=1, dtype=np.int64) - (c[:, 0].astype(np.int64) + c[:, -1]) / 2
+        return inner * self.scale - self.offset * (c.shape[1] - 1)
+
+    def integral(self, dt):
+        """Per-frame integral [V s] of frames sampled every dt."""
+        return self.trapezoid() * dt
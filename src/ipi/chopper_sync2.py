@@ -13,6 +13,7 @@ voffs = [0, 0, 0, 0]
 import time
 import numpy as np
 from pyvisa import errors
+from scope_io import BlockReader
 
 def _drain_input(s, max_ms=2000):
     """Non-blocking drain of any leftover bytes in the input buffer."""
@@ -34,116 +35,32 @@ def _drain_input(s, max_ms=2000):
     finally:
         s.timeout, s.read_termination = old_to, old_rt
 
-def _read_ieee_block_tolerant(s):
-    """Read one IEEE-488.2 block, tolerating stray leading LF/CR and eating the optional trailing LF."""
-    before = time.time_ns()
-    old_rt = s.read_termination
-    s.read_termination = None                      # raw bytes, no terminator handling
-    after = time.time_ns()
-    print (f"term chg{(after - before) / 1000000.0}")
-    # Find '#'
-    before = time.time_ns()
-    #b = s.read_bytes(1)
-
-    while True:
-        b = s.read_bytes(1)
-        print ('read garbag')
-        if b == b'#':
-            break
-        if b in (b'\n', b'\r', b' '):
-            continue  # skip whitespace/newlines
-        # Any other stray byte: keep skipping until we see '#'
-
-    after = time.time_ns()
-    print (f"delete #{(after - before) / 1000000.0}")
-    before = time.time_ns()
-
-    nd = int(s.read_bytes(1).decode())
-    n  = int(s.read_bytes(nd).decode())
-
-    print (nd)
-    after = time.time_ns()
-    print (f"preamble #{(after - before) / 1000000.0}")
-
-    before = time.time_ns()
-    payload = s.read_bytes(n)
-    after = time.time_ns()
-
-    print (f"payload #{(after - before) / 1000000.0}")
-    # Try to consume a single trailing LF without blocking
-    old_to = s.timeout
-    s.timeout = 1
-    try:
-        s.read_bytes(1)
-    except errors.VisaIOError:
-        print ('emptied')
-        pass
-    s.timeout = old_to
-    s.read_termination = old_rt
-    return payload
-
-def fetch_c1_window(scope):
+def read_channels_once(scope, reader, channels=("C1","C2","C3")):
     """
-    Atomic windowed fetch: clears buffer, sets STAR/POIN/SOUR, then reads the block safely.
-    Returns uint8 numpy array.
+    Fetch all channels in one transaction: every SOURce/DATA? pair goes out in a
+    single write and the blocks are read back-to-back (reader needs a ring of at
+    least len(channels) buffers).
+    Returns t (n_points,), V (n_channels, n_points) and the per-channel
+    (volts/code, offset) scaling used, taken from vdivs/voffs.
     """
-    # Known-good I/O state for this transaction
-    #scope.write_termination = '\n'
-    # 1) Drain leftovers from any prior failed read
-    #_drain_input(scope)
-
-    # 2) Batch the setters, then issue DATA?
-
-    # 3) Read the block robustly
-    block = _read_ieee_block_tolerant(scope)
-    return np.frombuffer(block, dtype=np.uint8)
-    
-def read_channel(scope, source="C1"):
-    global tdiv, delay, fs
-
     XINC  = 1.0 / fs
     XORIG = -delay - 5.0 * tdiv
-    XREF  = 0.0
 
-    before = time.time_ns()
-    scope.write(":WAVeform:SOURce " + source)
-    scope.write(":WAV:DATA?")
-    after = time.time_ns()
-    print (f"setmode #{(after - before) / 1000000.0}")
-    print ("reading")
-    u8 = fetch_c1_window(scope)
-    print ("done read")
-    print(f"{len(u8)}")
+    scope.write(";".join(f":WAVeform:SOURce {ch};:WAVeform:DATA?" for ch in channels))
+    blocks = [reader.read_block() for _ in channels]
 
-    s = u8.astype(np.int16); s[s > 127] -= 256
+    # BYTE transfer: unsigned codes above 127 are negative, i.e. plain int8
+    n = min(len(b) for b in blocks)
+    codes = np.empty((len(channels), n), dtype=np.int8)
+    for i, b in enumerate(blocks):
+        codes[i] = np.frombuffer(b, dtype=np.int8, count=n)
 
-    # If YINC/yorig/yref weren’t available from PREamble, fall back per-channel
-    # print(scope.query(f":CHANnel{source[1]}:SCALe?"))
+    scaling = np.array([(vdivs[int(ch[1])] / 25.0, voffs[int(ch[1])]) for ch in channels])
+    V = codes * scaling[:, 0:1] - scaling[:, 1:2]
 
-    print(source)
-    vdiv = vdivs[int(source[1])]
-    voff = voffs[int(source[1])]
-    volts = s * (vdiv / 25.0) - voff
+    t = np.arange(n, dtype=np.float64) * XINC + XORIG
+    return t, V, scaling
 
-    i = np.arange(volts.size, dtype=np.float64)
-    t = (i - XREF) * XINC + XORIG
-    return t, volts
-
-def read_channels_once(scope, channels=("C1","C2","C3")):
-    t = None
-    traces = {}
-    for ch in channels:
-        t_ch, v = read_channel(scope, ch)
-        time.sleep(0.1)
-        if t is None:
-            t = t_ch
-        else:
-            # ensure same length
-            n = min(len(t), len(v))
-            v = v[:n]; t = t[:n]
-        traces[ch] = v
-    return t, traces
- 
 #################################
 # Edge detection & measurements #
 #################################
@@ -300,6 +217,8 @@ def main(scope_addr="USB0::0xF4EC::0x100C::SDS2HBAX900425::INSTR",
     _drain_input(scope)
  
     configure_scope(scope)
+    channels = ("C1", "C2", "C3")
+    reader = BlockReader(scope, count=len(channels))
  
     interval = 1.0 / max(1e-3, poll_hz)
     ema_phase = None
@@ -307,14 +226,14 @@ def main(scope_addr="USB0::0xF4EC::0x100C::SDS2HBAX900425::INSTR",
     alpha = 0.3  # smoothing for readout
 
     while True:
-        t, traces = read_channels_once(scope, channels=("C1",))
+        t, V, scaling = read_channels_once(scope, reader, channels=("C1",))
         print('donee')
 
  
     while True:
-        t, traces = read_channels_once(scope, channels=("C1","C2","C3"))
-        v2 = traces["C2"]
-        v3 = traces["C3"]
+        t, V, scaling = read_channels_once(scope, reader, channels)
+        v2 = V[channels.index("C2")]
+        v3 = V[channels.index("C3")]
  
         # Rising edges
         tC2 = rising_edges_times(t, v2, threshold=ch2_threshold, hysteresis=hysteresis)
@@ -4,10 +4,13 @@ from tkinter import filedialog
 from datetime import date
 import re
 import os
-import struct
+import wavedesc
 import math
 import gc
+import dataclasses
 import numpy as np
+from scope_config import ScopeConfig
+from meas_group import MeasGroup
 
 rm = pyvisa.ResourceManager()
 scope_usb = "USB0::0xF4EC::0x100C::SDS2HBAX900425::INSTR"
@@ -16,12 +19,8 @@ scope = rm.open_resource(scope_usb)
 scope.timeout = 10000
 scope.write_termination = '\n'
 scope.read_termination  = '\n'
-
-tdiv_enum = [100e-12, 200e-12, 500e-12, 1e-9,
- 2e-9, 5e-9, 10e-9, 20e-9, 50e-9, 100e-9, 200e-9, 500e-9, \
- 1e-6, 2e-6, 5e-6, 10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6, \
- 1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 100e-3, 200e-3, 500e-3, \
- 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+config = ScopeConfig(scope)
+meas = MeasGroup(scope, range(1, 8))
 
 HORI_NUM = 10
 
@@ -36,79 +35,15 @@ port = serial.Serial(PORT, 115200, 8, "N", 1)
 #port.open()
 
 def main_desc(recv):
-    WAVE_ARRAY_1 = recv[0x3c:0x3f + 1]
-    wave_array_count = recv[0x74:0x77 + 1]
-    first_point = recv[0x84:0x87 + 1]
-    sp = recv[0x88:0x8b + 1]
-    v_scale = recv[0x9c:0x9f + 1]
-    v_offset = recv[0xa0:0xa3 + 1]
-    interval = recv[0xb0:0xb3 + 1]
-    code_per_div = recv[0xa4:0Xa7 + 1]
-    adc_bit = recv[0xac:0Xad + 1]
-    delay = recv[0xb4:0xbb + 1]
-    tdiv = recv[0x144:0x145 + 1]
-    probe = recv[0x148:0x14b + 1]
-    data_bytes = struct.unpack('i', WAVE_ARRAY_1)[0]
-    point_num = struct.unpack('i', wave_array_count)[0]
-    fp = struct.unpack('i', first_point)[0]
-    sp = struct.unpack('i', sp)[0]
-    interval = struct.unpack('f', interval)[0]
-    delay = struct.unpack('d', delay)[0]
-    tdiv_index = struct.unpack('h', tdiv)[0]
-    probe = struct.unpack('f', probe)[0]
-    vdiv = struct.unpack('f', v_scale)[0] * probe
-    offset = struct.unpack('f', v_offset)[0] * probe
-    code = struct.unpack('f', code_per_div)[0]
-    adc_bit = struct.unpack('h', adc_bit)[0]
-    tdiv = tdiv_enum[tdiv_index]
-    return vdiv, offset, interval, delay, tdiv, code, adc_bit
+    wd = wavedesc.parse(recv)
+    return wd.vdiv, wd.voff, wd.interval, wd.delay, wd.tdiv, wd.code_raw, wd.adc_bit
 
 
 # clear any old measurements and add the two we need
 # (Siglent firmwares vary; try A, then B if A raises an error)
 def setup_meas():
-    # one-time setup
-    #scope.write(":CHAN1:DISP ON; :CHAN2:DISP ON; :CHAN3:DISP ON")
-    #scope.write(":TRIG:MODE NORM; :TRIG:EDGE:SOUR C3; :TRIG:EDGE:SLOP RIS")
-
-    scope.write(f":CHAN{1}:VIS ON")  # Enable selected channel
-    scope.write(f":CHAN{2}:VIS ON")  # Enable selected channel
-    scope.write(f":CHAN{3}:VIS ON")  # Enable selected channel
-
-    scope.write(":ACQ:MODE RT")         # Real-time acquisition
-    scope.write(":ACQ:SRAT 200E6")      # 200 MSa/s Sampling Rate
-    scope.write(":ACQ:MDEP 10M")        # Match screen memory depth (10Mpts)  
-    scope.write(":TIMebase:SCALe 5e-3")       # 5ms per division
-    scope.write(":TIMebase:DELay 8e-3")       # 5ms per division
-
-    # Trigger settings
-    scope.write(":TRIG:MODE NORM")  
-    scope.write(":TRIG:TYPE EDGE")  
-    scope.write(":TRIGger:EDGE:SLOPe RIS")  
-    scope.write(":TRIGger:EDGE:LEVel 3.00")  
-    scope.write(":TRIGger:COUPling DC")  # DC coupling as shown on screen  
-    scope.write(":TRIGger:EDGE:SOUR C3")  # DC coupling as shown on screen  
-    scope.write(f":ACQ:MDEP 10k")
-
-    scope.write(":MEASure ON")
-    scope.write(":MEASure:MODE ADVanced")
-    scope.write(":MEASure:ADVanced:STYle M2")
-    scope.write(":MEASure:ADVanced:LINenumber 12")
-    scope.write(":MEASure:ADVanced:P1 ON")
-    scope.write(":MEASure:ADVanced:P2 ON")
-    scope.write(":MEASure:ADVanced:P3 ON")
-
-    scope.write(":MEASure:ADVanced:P1:TYPE PHA")
-    scope.write(":MEASure:ADVanced:P2:TYPE SKEW")
-
-    
-    scope.write(":MEASure:ADVanced:P1:SOURce1 C3")  # laser vs chopper
-    scope.write(":MEASure:ADVanced:P1:SOURce2 C2")
-
-    scope.write(":MEASure:ADVanced:P2:SOURce1 C3")  # laser vs chopper
-    scope.write(":MEASure:ADVanced:P2:SOURce2 C2")
-
-    scope.write(":RUN")
+    # After the first call only what read_wf() changed goes out again
+    config.apply("measurement", actions=(":RUN",))
 
 
 def send_chopper_cmd(cmd):
@@ -162,15 +97,10 @@ def read_wf():
 
     scope.chunk_size = 20 * 1024 * 1024
     #scope.write(":ACQ:MDEP 100M")        # Match screen memory depth (10Mpts)  
-    scope.write(":TIMebase:SCALe 2e-4")       # 5ms per division
-    scope.write(":TIMebase:DELay 1e-6") 
+    config.apply("snapshot")
 
     time.sleep(0.1)
 
-
-    scope.write(":WAVeform:STARt 0")
-    scope.write("WAV:SOUR C1")
-    scope.write(":WAVeform:INTerval 0")
     scope.write("WAV:PREamble?")
 
     a = scope.read_raw()
@@ -182,43 +112,27 @@ def read_wf():
     points = float(scope.query(":ACQuire:POINts?").strip())
     one_piece_num = float(scope.query(":WAVeform:MAXPoint?").strip())
     if points > one_piece_num:
-        scope.write(":WAVeform:POINt {}".format(one_piece_num))
+        config.apply({":WAVeform:POINt": one_piece_num})
     if adc_bit > 8:
-        scope.write(":WAVeform:WIDTh WORD")
+        config.apply({":WAVeform:WIDTh": "WORD"})
     read_times = math.ceil(points / one_piece_num)
-    recv_all = []
+    recv_all = bytearray()
     for i in range(0, read_times):
         start = i * one_piece_num
-        scope.write(":WAVeform:STARt {}".format(start))
-        scope.write("WAV:DATA?")
+        config.apply({":WAVeform:STARt": start}, actions=(":WAVeform:DATA?",))
         recv_rtn = scope.read_raw().rstrip()
         block_start = recv_rtn.find(b'#')
         data_digit = int(recv_rtn[block_start + 1:block_start + 2])
         data_start = block_start + 2 + data_digit
-        recv = list(recv_rtn[data_start:])
-        recv_all += recv
-    convert_data = []
-    if adc_bit > 8:
-        for i in range(0, int(len(recv_all) / 2)):
-            data = recv_all[2 * i + 1] * 256 + recv_all[2 * i]
-            convert_data.append(data)
-    else:
-        convert_data = recv_all
-    volt_value = []
-    for data in convert_data:
-        if data > pow(2, adc_bit - 1) - 1:
-            data = data - pow(2, adc_bit)
-        else:
-            pass
-        volt_value.append(data)
-
-    del recv, recv_all, convert_data
+        recv_all += recv_rtn[data_start:]
+    # signed codes -> volts in one lookup (wavedesc.decode_volts); WORD samples are LSB first
+    width = 2 if adc_bit > 8 else 1
+    wd = dataclasses.replace(wavedesc.parse(recv), width=width - 1, order=0, read_frame=1)
+    volt_value = wavedesc.decode_volts(wd, recv_all[:len(recv_all) // width * width])[0]
+
+    del recv, recv_all
     gc.collect()
-    time_value = []
-    for idx in range(0, len(volt_value)):
-        volt_value[idx] = volt_value[idx] / vcode_per * float(vdiv) - float(ofst)
-        time_data = - (float(tdiv) * HORI_NUM / 2) + idx * interval + float(trdl)
-        time_value.append(time_data)
+    time_value = - (float(tdiv) * HORI_NUM / 2) + np.arange(len(volt_value)) * interval + float(trdl)
 
     for i in range(0, len(volt_value), 1000):
         print(f"{time_value[i]}: {volt_value[i]}")
@@ -247,12 +161,6 @@ def upd_wf():
     if  time.time() - last_wf > MAX_WF_TIME:
         read_wf()
 
-def read_meaus(path):
-    try:
-        return float(scope.query(path))
-    except ValueError:
-        return float('nan')
-
 def select_file():
     global file_paths1
     file_paths1 = filedialog.asksaveasfilename(
@@ -300,14 +208,8 @@ def read_loop():
         dtt = now-start
 
         # Try the “RESULT?” form first What does this mean
-        dt, ph, vpp, filt, avg_vpp, amplitude, rms  = float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan')
-        ph = read_meaus(":MEASure:ADVanced:P1:VALue?")
-        dt = read_meaus(":MEASure:ADVanced:P2:VALue?")
-        vpp = read_meaus(":MEASure:ADVanced:P3:VALue?")
-        filt = read_meaus(":MEASure:ADVanced:P4:VALue?")
-        avg_vpp = read_meaus(":MEASure:ADVanced:P5:VALue?")
-        amplitude = read_meaus(":MEASure:ADVanced:P6:VALue?")
-        rms = read_meaus(":MEASure:ADVanced:P7:VALue?")
+        # P1..P7 in one round trip, nan where the scope has no valid value
+        ph, dt, vpp, filt, avg_vpp, amplitude, rms = meas.read()
 
         if ph > 360:
                 ph -= 360
@@ -5,7 +5,7 @@ from tkinter import filedialog
 from datetime import date
 import re
 import os
-import struct
+import wavedesc
 import math
 import gc
 import numpy as np
@@ -18,41 +18,11 @@ scope.timeout = 10000
 scope.write_termination = '\n'
 scope.read_termination  = '\n'
 
-tdiv_enum = [100e-12, 200e-12, 500e-12, 1e-9,
- 2e-9, 5e-9, 10e-9, 20e-9, 50e-9, 100e-9, 200e-9, 500e-9, \
- 1e-6, 2e-6, 5e-6, 10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6, \
- 1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 100e-3, 200e-3, 500e-3, \
- 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
-
 HORI_NUM = 10
 
 def main_desc(recv):
-    WAVE_ARRAY_1 = recv[0x3c:0x3f + 1]
-    wave_array_count = recv[0x74:0x77 + 1]
-    first_point = recv[0x84:0x87 + 1]
-    sp = recv[0x88:0x8b + 1]
-    v_scale = recv[0x9c:0x9f + 1]
-    v_offset = recv[0xa0:0xa3 + 1]
-    interval = recv[0xb0:0xb3 + 1]
-    code_per_div = recv[0xa4:0Xa7 + 1]
-    adc_bit = recv[0xac:0Xad + 1]
-    delay = recv[0xb4:0xbb + 1]
-    tdiv = recv[0x144:0x145 + 1]
-    probe = recv[0x148:0x14b + 1]
-    data_bytes = struct.unpack('i', WAVE_ARRAY_1)[0]
-    point_num = struct.unpack('i', wave_array_count)[0]
-    fp = struct.unpack('i', first_point)[0]
-    sp = struct.unpack('i', sp)[0]
-    interval = struct.unpack('f', interval)[0]
-    delay = struct.unpack('d', delay)[0]
-    tdiv_index = struct.unpack('h', tdiv)[0]
-    probe = struct.unpack('f', probe)[0]
-    vdiv = struct.unpack('f', v_scale)[0] * probe
-    offset = struct.unpack('f', v_offset)[0] * probe
-    code = struct.unpack('f', code_per_div)[0]
-    adc_bit = struct.unpack('h', adc_bit)[0]
-    tdiv = tdiv_enum[tdiv_index]
-    return vdiv, offset, interval, delay, tdiv, code, adc_bit
+    wd = wavedesc.parse(recv)
+    return wd.vdiv, wd.voff, wd.interval, wd.delay, wd.tdiv, wd.code_raw, wd.adc_bit
 
 
 # clear any old measurements and add the two we need
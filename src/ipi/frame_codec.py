@@ -0,0 +1,90 @@
+"""
+Lossless compression of ADC code frames for snapshot files.
+
+A chunk is a run of whole frames, optionally delta-encoded along each frame
+(first code, then differences; wrapping integer arithmetic, so exact for
+int8 and int16) and compressed on its own, so any frame can be read back by
+decompressing just its chunk. The delta only pays off when the baseline is
+smoother than the ADC noise: on white noise of a couple of codes it doubles
+the noise variance and loses ~7% of the ratio (bench_compression.py), so
+it is off by default; check it on recorded data.
+
+Codecs: zlib and lzma from the standard library, zstd when the zstandard
+package is installed. The compressors release the GIL, so encode_chunks /
+decode_chunks spread chunks over a thread pool.
+"""
+import concurrent.futures
+import lzma
+import os
+import zlib
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:     # optional: zlib / lzma only
+    zstandard = None
+
+CHUNK_FRAMES = 32       # frames per independently decompressible chunk
+LEVELS = {"zlib": 1, "lzma": 0, "zstd": 3}      # fast settings that keep up with acquisition
+DEFAULT = "zstd" if zstandard is not None else "zlib"
+DELTA = False
+
+def available():
+    return [name for name in LEVELS if name != "zstd" or zstandard is not None]
+
+def _compressor(codec, level):
+    level = LEVELS[codec] if level is None else level
+    if codec == "zlib":
+        return lambda raw: zlib.compress(raw, level)
+    if codec == "lzma":
+        return lambda raw: lzma.compress(raw, preset=level)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        return lambda raw: zstandard.ZstdCompressor(level=level).compress(raw)
+    raise ValueError(f"Unknown codec {codec!r}, expected one of {list(LEVELS)}")
+
+def _decompressor(codec):
+    if codec == "zlib":
+        return zlib.decompress
+    if codec == "lzma":
+        return lzma.decompress
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("reading zstd snapshots needs the zstandard package")
+        return lambda blob: zstandard.ZstdDecompressor().decompress(blob)
+    raise ValueError(f"Unknown codec {codec!r}, expected one of {list(LEVELS)}")
+
+def delta(codes):
+    d = np.empty_like(codes)
+    d[:, :1] = codes[:, :1]
+    np.subtract(codes[:, 1:], codes[:, :-1], out=d[:, 1:])
+    return d
+
+def undelta(d):
+    return np.cumsum(d, axis=1, dtype=d.dtype)
+
+_pool = None
+
+def pool():
+    """Thread pool shared by all writers and readers."""
+    global _pool
+    if _pool is None:
+        _pool = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 2,
+                                                      thread_name_prefix="frame-codec")
+    return _pool
+
+def encode_chunks(codes, codec, level=None, chunk_frames=CHUNK_FRAMES, workers=None, use_delta=DELTA):
+    """[(n_frames, blob)] for consecutive chunks of codes (n_frames, n_points), compressed in parallel."""
+    compress = _compressor(codec, level)
+    little = codes.dtype.newbyteorder("<")
+    pieces = [codes[i:i + chunk_frames] for i in range(0, len(codes), chunk_frames)]
+    blobs = (workers or pool()).map(lambda c: compress((delta(c) if use_delta else c).astype(little).tobytes()), pieces)
+    return [(len(c), blob) for c, blob in zip(pieces, blobs)]
+
+def decode_chunk(blob, codec, dtype, n_points, use_delta=DELTA):
+    d = np.frombuffer(_decompressor(codec)(blob), dtype=dtype).reshape(-1, n_points)
+    return undelta(d) if use_delta else d
+
+def decode_chunks(blobs, codec, dtype, n_points, workers=None, use_delta=DELTA):
+    return list((workers or pool()).map(lambda b: decode_chunk(b, codec, dtype, n_points, use_delta), blobs))
@@ -0,0 +1,103 @@
+import struct
+import numpy as np
+
+import wavedesc
+from scope_io import BlockReader
+
+class HistoryFrameReader:
+    """
+    Incremental reader for sequence/history frames that leaves the scope running.
+
+    Keeps a 1-based frame cursor and asks only for frames acquired since the
+    previous call with :WAVeform:SEQuence 0,<cursor>. The scope may return
+    fewer frames than are pending (transfer size limit); they are picked up by
+    the next call, see `pending`.
+
+    A restarted acquisition (sequence memory wrapped, re-armed, history
+    cleared) shows up either as sum_frame dropping below the cursor or as the
+    frame just before the cursor carrying a different timestamp than the one
+    we handed out; in both cases the cursor goes back to frame 1.
+    """
+
+    def __init__(self, scope, reader=None, source="C1"):
+        self.scope = scope
+        self.reader = reader if reader is not None else BlockReader(scope, count=2)
+        self.source = source
+        self.next_start = 1
+        self.pending = 0
+        self.resets = 0
+        self._last_stamp = None
+
+    def reset(self):
+        self.next_start = 1
+        self._last_stamp = None
+        self.resets += 1
+
+    def _preamble(self, start):
+        self.scope.write(f":WAVeform:SOURce {self.source};:WAVeform:SEQuence 0,{start}")
+        self.scope.write(":WAVeform:PREamble?")
+        desc = bytes(self.reader.read_block())
+        wd = wavedesc.parse(desc)
+        return desc, wd.read_frame, wd.sum_frame
+
+    def read_new(self):
+        """
+        Fetch frames acquired since the last call.
+
+        Returns (desc, data, first) where data is the raw DATA? payload for
+        read_frame frames starting at frame number `first`, or (desc, None,
+        first) when nothing new has been acquired. desc is the WAVEDESC of
+        this transfer, so both can go straight into decode_sequence_waveforms.
+        """
+        # Re-request the last frame we already have: if its timestamp changed,
+        # the acquisition restarted underneath us.
+        overlap = 1 if self._last_stamp is not None else 0
+        desc, read_frame, sum_frame = self._preamble(self.next_start - overlap)
+
+        restarted = sum_frame < self.next_start - 1
+        if not restarted and overlap and read_frame > 0:
+            restarted = _stamp(desc, read_frame, 0) != self._last_stamp
+        if restarted:
+            self.reset()
+            overlap = 0
+            desc, read_frame, sum_frame = self._preamble(1)
+
+        if sum_frame < self.next_start or read_frame <= overlap:
+            self.pending = 0
+            return desc, None, self.next_start
+
+        self.scope.write(":WAVeform:DATA?")
+        data = self.reader.read_block()
+        last_stamp = _stamp(desc, read_frame, read_frame - 1)
+
+        if overlap:
+            data = data[len(data) // read_frame:]
+            desc = _drop_first_frame(desc, read_frame)
+            read_frame -= 1
+
+        first = self.next_start
+        self.next_start += read_frame
+        self.pending = sum_frame - (self.next_start - 1)
+        self._last_stamp = last_stamp
+        return desc, data, first
+
+    def read_new_frames(self):
+        """Raw codes of the new frames as a (n_frames, n_pts) array, plus desc."""
+        desc, data, first = self.read_new()
+        if data is None:
+            return np.empty((0, 0), dtype=np.uint8), desc
+        wd = wavedesc.parse(desc)
+        dtype = np.uint8 if wd.width == 0 else (">u2" if wd.order == 1 else "<u2")
+        codes = np.frombuffer(data, dtype=dtype)
+        return codes.reshape(wd.read_frame, len(codes) // wd.read_frame), desc
+
+def _stamp(desc, read_frame, i):
+    # 16-byte timestamp records of the returned frames sit at the end of WAVEDESC
+    base = len(desc) - 16 * read_frame
+    return desc[base + 16 * i:base + 16 * (i + 1)]
+
+def _drop_first_frame(desc, read_frame):
+    base = len(desc) - 16 * read_frame
+    out = bytearray(desc[:base])
+    struct.pack_into("<I", out, 0x90, read_frame - 1)
+    return bytes(out + desc[base + 16:])
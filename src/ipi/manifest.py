@@ -0,0 +1,127 @@
+"""
+Dataset manifests: what an exposure holds, without listing or opening files.
+
+Each exposure folder gets a manifest.json, kept by segment_writer: one entry
+per segment (file set) with its file names, frame count and shape, first /
+last frame timestamps, the snapshot's byte offsets (snapshot_file layout)
+and the epoch ns the chopper t column counts from. An entry is written when its segment opens (complete: false) and
+rewritten when it closes, so after a crash the open segment is still listed.
+The datasets folder gets an exposures.json listing the exposures in the
+order they were started. Both are replaced atomically (write + rename), so
+a reader never sees half a file.
+
+Folders from before manifests fall back to the old directory scan.
+"""
+import datetime
+import json
+import os
+import re
+import time
+import numpy as np
+
+MANIFEST = "manifest.json"
+INDEX = "exposures.json"
+VERSION = 1
+
+SNAPSHOT_RE = re.compile(r"snapshot_(\d+)\.(csv|snap)$")
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _dump(path, doc):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(doc, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def segment_files(stamp, snapshot_ext="snap"):
+    """Names of the files of segment stamp."""
+    return {"snapshot": f"snapshot_{stamp}.{snapshot_ext}", "pulses": f"pulses_{stamp}.dat",
+            "bursts": f"bursts_{stamp}.csv", "gaps": f"gaps_{stamp}.csv", "chopper": f"chopper_{stamp}.csv"}
+
+class Manifest:
+    """The manifest of one exposure folder being written."""
+
+    def __init__(self, folder, meta=None):
+        self.path = os.path.join(folder, MANIFEST)
+        self.doc = {"version": VERSION, "exposure": os.path.basename(os.path.normpath(folder)),
+                    "meta": dict(meta or {}), "segments": []}
+
+    def put(self, entry):
+        """Add the entry of a segment, or replace the one with the same stamp, and save."""
+        entries = self.doc["segments"]
+        for i, old in enumerate(entries):
+            if old["stamp"] == entry["stamp"]:
+                entries[i] = entry
+                break
+        else:
+            entries.append(entry)
+        _dump(self.path, self.doc)
+
+def register_exposure(save_path, name):
+    """Append exposure folder name to the datasets index."""
+    path = os.path.join(save_path, INDEX)
+    index = _load(path) or {"version": VERSION, "exposures": []}
+    index["exposures"].append({"name": name, "started_ns": time.time_ns()})
+    _dump(path, index)
+
+def exposures(save_path):
+    """Exposure folder names, oldest first: from the index, or by ctime for datasets without one."""
+    index = _load(os.path.join(save_path, INDEX))
+    if index and index["exposures"]:
+        return [e["name"] for e in index["exposures"]]
+    folders = [x for x in os.listdir(save_path) if os.path.isdir(os.path.join(save_path, x))]
+    return sorted(folders, key=lambda x: os.path.getctime(os.path.join(save_path, x)))
+
+def latest_exposure(save_path):
+    return exposures(save_path)[-1]
+
+def segments(folder, start_ns=None, end_ns=None):
+    """
+    Segment entries of an exposure in acquisition order; with start_ns /
+    end_ns only those whose frames overlap the range (segments without
+    timestamps, i.e. unclosed or scanned ones, are kept: the caller filters
+    their frames).
+    """
+    doc = _load(os.path.join(folder, MANIFEST))
+    if doc is None:
+        entries = _scan(folder)
+    else:
+        entries = sorted(doc["segments"], key=lambda e: e["stamp"])
+    return [e for e in entries
+            if not ((start_ns is not None and e.get("last_ns") is not None and e["last_ns"] < start_ns)
+                    or (end_ns is not None and e.get("first_ns") is not None and e["first_ns"] > end_ns))]
+
+def _scan(folder):
+    """Entries of a folder written before manifests: names only."""
+    found = {int(m.group(1)): m.group(2) for m in map(SNAPSHOT_RE.match, os.listdir(folder)) if m}
+    return [dict(segment_files(stamp, ext), stamp=stamp) for stamp, ext in sorted(found.items())]
+
+def in_range(epochs_ns, start_ns=None, end_ns=None):
+    """Mask of the timestamps inside [start_ns, end_ns]."""
+    epochs_ns = np.asarray(epochs_ns)
+    keep = np.ones(len(epochs_ns), dtype=bool)
+    if start_ns is not None:
+        keep &= epochs_ns >= start_ns
+    if end_ns is not None:
+        keep &= epochs_ns <= end_ns
+    return keep
+
+def parse_time(text):
+    """
+    Epoch ns from epoch seconds or an ISO date / datetime. A time without a
+    timezone is read as UTC, like the scope clock in wavedesc.frame_epochs_ns.
+    """
+    try:
+        return int(float(text) * 1e9)
+    except ValueError:
+        when = datetime.datetime.fromisoformat(text)
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=datetime.timezone.utc)
+        return int(when.timestamp() * 1e9)
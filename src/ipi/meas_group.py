@@ -0,0 +1,47 @@
+"""
+Read a set of :MEASure:ADVanced:Pn values in one round trip.
+
+All :VALue? queries go out in one write. The scope answers them as one
+';'-separated line (IEEE 488.2 compound query); answers split over several
+lines are collected too. Values the scope marks invalid (9.9e37, "****")
+come back as nan.
+"""
+import math
+import re
+
+_float_pat = re.compile(r'[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?')
+
+def parse_float(s):
+    m = _float_pat.search(s)
+    if not m: return None
+    x = float(m.group(0))
+    # Siglent uses 9.9e37 (or similar) as "invalid"
+    return None if abs(x) > 1e30 else x
+
+class MeasGroup:
+    """
+    items: the Pn numbers to read, in the order read() returns them.
+    reader: anything with read_line() (scope_io.BlockReader, SocketScope,
+    BrokerScope); defaults to the scope itself, or its read() for a plain
+    pyvisa resource with read_termination '\\n'.
+    """
+
+    def __init__(self, scope, items=range(1, 8), reader=None):
+        self.scope = scope
+        self.items = list(items)
+        self.query = ";".join(f":MEASure:ADVanced:P{n}:VALue?" for n in self.items)
+        if reader is None:
+            reader = scope
+        self._read_line = reader.read_line if hasattr(reader, "read_line") else reader.read
+
+    def read(self):
+        """Values for self.items as floats, nan where the scope has no valid result."""
+        self.scope.write(self.query)
+        fields = []
+        while len(fields) < len(self.items):
+            fields += [f for f in self._read_line().strip().split(";") if f.strip()]
+        values = [parse_float(f) for f in fields[:len(self.items)]]
+        return [math.nan if v is None else v for v in values]
+
+    def read_dict(self):
+        return dict(zip(self.items, self.read()))
@@ -1,41 +1,17 @@
 import time, struct, numpy as np
-from pyvisa import ResourceManager, errors as visa_errors
+from pyvisa import ResourceManager
+from scope_io import BlockReader
+import acq_wait
 
-def read_line(inst):
-    buf = bytearray()
-    while True:
-        b = inst.read_bytes(1)
-        if b == b'\n': return buf.decode('ascii', 'ignore').strip()
-        buf += b
-
-def read_hash_block(inst):
-    # Skip any "C1:WF ..." prefix until '#'
-    while True:
-        try:
-            b = inst.read_bytes(1)
-            if b == b'#': break
-        except visa_errors.VisaIOError:
-            pass
-    nd = int(inst.read_bytes(1).decode())
-    n  = int(inst.read_bytes(nd).decode())
-    payload = inst.read_bytes(n)
-    # eat trailing CR/LF (non-blocking)
-    try:
-        inst.timeout = 1
-        while True:
-            c = inst.read_bytes(1)
-            if c not in (b'\r', b'\n'): break
-    except visa_errors.VisaIOError:
-        pass
-    finally:
-        inst.timeout = 1000
-    return payload
+PULSE_RATE = 100
 
 rm = ResourceManager()
 scope = rm.open_resource("TCPIP0::10.11.13.220::5025::SOCKET")  # or USB0::...::INSTR
 scope.write_termination = '\n'
 scope.read_termination  = None
 scope.timeout = 10000
+reader = BlockReader(scope, size=16 * 1024 * 1024)
+waiter = acq_wait.PredictedWait(PULSE_RATE)
 
 # --- one-time config ---
 scope.write(":STOP")
@@ -58,25 +34,21 @@ def capture_burst_and_read(N=200):
     scope.write(":TRIGger:MODE SINGle")
     scope.write(":TRIGger:RUN")
     scope.write(":SINGle")
-    # Wait until stopped (acq done). Poll a light ASCII that changes on stop:
-    while True:
-        scope.write(":TRIG:STAT?")
-        st = read_line(scope)  # e.g., "STOP"
-        print(st)
-        if "STOP" in st.upper(): break
-        time.sleep(0.02)
+    waiter.armed(N)
+    # Wait until stopped (acq done)
+    waiter.wait(scope, reader)
 
     # Freeze a consistent snapshot is already ensured (we're stopped)
     scope.write(":WAV:SEQuence 0,1")   # request all frames starting at 1
     scope.write(":WAV:PRE?")
-    desc = read_hash_block(scope)
+    desc = bytes(reader.read_block())
     u32 = lambda o: int.from_bytes(desc[o:o+4], 'little')
     f32 = lambda o: struct.unpack('<f', desc[o:o+4])[0]
     npts = u32(116)                    # points per frame
     dt   = f32(176)                    # seconds/sample
 
     scope.write(":WAV:DATA?")
-    data = read_hash_block(scope)
+    data = reader.read_block()
     nfrm = len(data)//npts
     arr  = np.frombuffer(data[:nfrm*npts], dtype=np.uint8).reshape(nfrm, npts)
 
@@ -0,0 +1,84 @@
+"""
+Pulse-loss accounting from the per-frame hardware timestamps.
+
+Every sequence frame is one laser pulse, so consecutive frame timestamps
+should be one pulse period apart. A larger step means pulses were fired and
+not captured: between bursts (re-arm / transfer dead time) or inside one
+(missed triggers). GapDetector counts them burst by burst and keeps the
+missing time spans, so the coverage of an exposure is measured rather than
+assumed.
+"""
+import numpy as np
+
+BURST_FIELDS = "first_s,last_s,frames,missed_before,missed_within,period_s"
+GAP_FIELDS = "start_s,end_s,missed"
+
+class GapDetector:
+    """
+    Feed it the epoch-ns timestamps of every burst, in acquisition order.
+
+    The period starts at 1 / pulse_rate and follows the median frame spacing
+    measured inside bursts (within `drift` of nominal), so a slightly off
+    laser clock doesn't turn into phantom misses over long gaps.
+    """
+
+    def __init__(self, pulse_rate, drift=0.05, alpha=0.2):
+        self.nominal_ns = 1e9 / pulse_rate
+        self.period_ns = self.nominal_ns
+        self.drift = drift
+        self.alpha = alpha
+        self.last_ns = None
+        self.captured = 0
+        self.missed = 0
+
+    def reset(self):
+        """Forget the previous burst, e.g. after the acquisition was restarted."""
+        self.last_ns = None
+
+    def add_burst(self, epochs_ns):
+        """
+        Account for one burst. Returns (burst_row, gap_rows): burst_row is
+        (first_s, last_s, frames, missed_before, missed_within, period_s),
+        gap_rows a list of (start_s, end_s, missed), start/end being the
+        timestamps of the captured frames on either side of the gap.
+        """
+        ts = np.asarray(epochs_ns, dtype=np.int64)
+        if len(ts) == 0:
+            return None, []
+
+        steps = np.diff(ts)
+        self._learn_period(steps)
+        periods = np.rint(steps / self.period_ns).astype(np.int64)
+        within = np.maximum(periods - 1, 0)
+
+        gaps = [(int(ts[i]), int(ts[i + 1]), int(within[i])) for i in np.flatnonzero(within)]
+        before = 0
+        if self.last_ns is not None:
+            before = max(int(round((ts[0] - self.last_ns) / self.period_ns)) - 1, 0)
+            if before:
+                gaps.insert(0, (self.last_ns, int(ts[0]), before))
+        self.last_ns = int(ts[-1])
+
+        self.captured += len(ts)
+        self.missed += before + int(within.sum())
+
+        burst = (int(ts[0]) / 1e9, int(ts[-1]) / 1e9, len(ts), before, int(within.sum()), self.period_ns / 1e9)
+        return burst, [(a / 1e9, b / 1e9, n) for a, b, n in gaps]
+
+    def coverage(self):
+        total = self.captured + self.missed
+        return self.captured / total if total else float('nan')
+
+    def _learn_period(self, steps):
+        if len(steps) == 0:
+            return
+        measured = float(np.median(steps))
+        if abs(measured - self.nominal_ns) <= self.drift * self.nominal_ns:
+            self.period_ns += self.alpha * (measured - self.period_ns)
+
+def fired_pulses(bursts):
+    """Pulses fired over the span of a burst table (rows as saved by collect_data_bulk)."""
+    bursts = np.atleast_2d(bursts)
+    if bursts.size == 0:
+        return 0
+    return int(bursts[:, 2].sum() + bursts[:, 3].sum() + bursts[:, 4].sum())
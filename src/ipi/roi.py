@@ -0,0 +1,53 @@
+"""
+Region-of-interest transfers: fetch only the part of each frame around the pulse.
+
+find_roi() looks at a calibration burst read with the whole record, finds
+where the frames leave their baseline and keeps that window plus a baseline
+margin in front (process_snapshots averages the first OFF_NUM = 98 samples as
+the pulse's baseline) and a tail margin behind. Roi.scope_settings() turns it
+into :WAVeform:STARt/:WAVeform:POINt for the following bursts; start and
+points are kept in transferred (decimated) samples, so the time axis of a ROI
+frame is the full frame's axis sliced at [start:start + points].
+"""
+import dataclasses
+import numpy as np
+
+BASELINE_PTS = 100      # samples before the pulse, >= process_snapshots' OFF_NUM
+TAIL_PTS = 100          # samples after the last one above threshold
+THRESHOLD = 0.1         # of the largest excursion from baseline
+
+@dataclasses.dataclass(frozen=True)
+class Roi:
+    start: int          # first transferred sample of the window
+    points: int         # transferred samples per frame
+    interval: int       # :WAV:INTerval the window was found at
+    full_points: int    # transferred samples of the whole frame
+
+    def scope_settings(self):
+        # :WAV:STARt counts acquired points, :WAV:POINt transferred ones
+        return {":WAVeform:STARt": str(self.start * self.interval), ":WAVeform:POINt": str(self.points)}
+
+    def time_axis(self, full_t):
+        """The ROI part of the full frame's time axis (a view)."""
+        return full_t[self.start:self.start + self.points]
+
+    def as_dict(self):
+        return dataclasses.asdict(self)
+
+def find_roi(V, interval, baseline_pts=BASELINE_PTS, tail_pts=TAIL_PTS, threshold=THRESHOLD):
+    """
+    Roi around the pulse in a calibration burst V (frames, points) of whole
+    records. None for a flat burst.
+    """
+    V = np.atleast_2d(V)
+    n_pts = V.shape[1]
+    # averaged over frames: the triggered pulse adds up, noise spikes don't
+    excursion = np.abs(V - np.median(V, axis=1, keepdims=True)).mean(axis=0)
+    peak = excursion.max()
+    if not peak > 0:
+        return None
+
+    above = np.flatnonzero(excursion >= threshold * peak)
+    start = max(int(above[0]) - baseline_pts, 0)
+    stop = min(int(above[-1]) + 1 + tail_pts, n_pts)
+    return Roi(start, stop - start, int(interval), n_pts)
@@ -0,0 +1,235 @@
+"""
+asyncio transport for the SDS2000X HD raw SCPI socket (port 5025), no VISA.
+
+AsyncScope is the asyncio side: queries can be pipelined (several in flight,
+answers are matched to them in send order) and binary blocks are parsed
+straight off the stream into reusable buffers.
+
+SocketScope wraps it for the blocking scripts. It has the small surface they
+use on a pyvisa resource (write / query / timeout / clear / close) plus the
+read_line / read_block of scope_io.BlockReader, so it serves as both `scope`
+and `reader`. Get one through scope_io.open_scope(..., transport="socket").
+"""
+import asyncio
+import collections
+import threading
+
+PREFIX_LIMIT = 256
+
+class AsyncScope:
+    def __init__(self, host, port=5025, timeout=10.0, size=1 << 20, count=1):
+        self.host = host
+        self.port = port
+        self.timeout = timeout          # seconds, per response
+        self._bufs = [bytearray(size) for _ in range(count)]
+        self._next = 0
+        self._r = None
+        self._w = None
+        self._write_lock = asyncio.Lock()
+        self._waiters = collections.deque()
+        self._wakeup = asyncio.Event()
+        self._pump_task = None
+
+    async def open(self):
+        self._r, self._w = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        self._start_pump()
+
+    async def close(self):
+        await self._stop_pump()
+        if self._w:
+            self._w.close()
+            try:
+                await self._w.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    # ---- commands ----
+    async def write(self, cmd):
+        async with self._write_lock:
+            self._w.write(cmd.encode("ascii") + b"\n")
+            await self._w.drain()
+
+    async def query(self, cmd):
+        return await self._send_and_expect(cmd, "line")
+
+    async def query_block(self, cmd):
+        return await self._send_and_expect(cmd, "block")
+
+    async def query_many(self, cmds):
+        """Send all queries in one write, then collect the answers in order."""
+        async with self._write_lock:
+            futs = [self._expect("line") for _ in cmds]
+            self._w.write("".join(c + "\n" for c in cmds).encode("ascii"))
+            await self._w.drain()
+        return [await self._wait(f) for f in futs]
+
+    async def read_line(self):
+        """Answer to a query sent with write()."""
+        return await self._wait(self._expect("line"))
+
+    async def read_block(self):
+        return await self._wait(self._expect("block"))
+
+    # ---- response matching ----
+    async def _send_and_expect(self, cmd, kind):
+        async with self._write_lock:
+            fut = self._expect(kind)
+            self._w.write(cmd.encode("ascii") + b"\n")
+            await self._w.drain()
+        return await self._wait(fut)
+
+    def _expect(self, kind):
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((kind, fut))
+        self._wakeup.set()
+        return fut
+
+    async def _wait(self, fut):
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), self.timeout)
+        except asyncio.TimeoutError:
+            await self._drop(fut)
+            raise TimeoutError(f"No answer from {self.host}:{self.port} within {self.timeout} s") from None
+
+    async def _drop(self, fut):
+        """Forget a timed-out query so the answers after it go to their own queries."""
+        fut.cancel()
+        head = bool(self._waiters) and self._waiters[0][1] is fut
+        if head:
+            # the pump is reading this answer off the stream: stop it first
+            await self._stop_pump()
+        try:
+            for item in self._waiters:
+                if item[1] is fut:
+                    self._waiters.remove(item)
+                    break
+        finally:
+            if head:
+                self._start_pump()
+
+    def _start_pump(self):
+        self._pump_task = asyncio.get_running_loop().create_task(self._pump())
+
+    async def _stop_pump(self):
+        # wait until the cancelled pump has let go of the reader before anyone else reads from it
+        task, self._pump_task = self._pump_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.wait([task])
+
+    async def _pump(self):
+        # single consumer of the stream: answers arrive in the order they were asked for
+        while True:
+            while not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            kind, fut = self._waiters[0]
+            try:
+                result = await (self._parse_line() if kind == "line" else self._parse_block())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._waiters.popleft()
+                if not fut.done():
+                    fut.set_exception(e)
+                continue
+            self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(result)
+
+    async def _parse_line(self):
+        while True:
+            line = (await self._r.readline()).decode("ascii", "ignore").strip()
+            if line:
+                return line
+
+    async def _parse_block(self):
+        # skip "C1:WF DAT2," style prefix and CR/LF left over from the previous block
+        await self._r.readuntil(b"#")
+        nd = int(await self._r.readexactly(1))
+        n = int(await self._r.readexactly(nd))
+        view = self._reserve(n)
+        got = 0
+        while got < n:
+            chunk = await self._r.read(n - got)
+            if not chunk:
+                raise ConnectionError("scope closed the connection")
+            view[got:got + len(chunk)] = chunk
+            got += len(chunk)
+        return view
+
+    def _reserve(self, n):
+        i = self._next
+        self._next = (i + 1) % len(self._bufs)
+        if len(self._bufs[i]) < n:
+            self._bufs[i] = bytearray(max(n, 2 * len(self._bufs[i])))
+        return memoryview(self._bufs[i])[:n]
+
+    async def clear(self):
+        """Forget outstanding answers and drop whatever is left in the input."""
+        while self._waiters:
+            _, fut = self._waiters.popleft()
+            if not fut.done():
+                fut.cancel()
+        await self._stop_pump()
+        try:
+            while True:
+                try:
+                    if not await asyncio.wait_for(self._r.read(1 << 16), 0.05):
+                        break
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            self._start_pump()
+
+class SocketScope:
+    """Blocking facade over AsyncScope, running its event loop on a daemon thread."""
+
+    def __init__(self, host, port=5025, timeout=10000, count=1):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._scope = self._run(self._make(host, port, timeout / 1000.0, count))
+        # accepted for pyvisa compatibility; the socket is always LF-terminated
+        self.write_termination = '\n'
+        self.read_termination = None
+        self.chunk_size = 1 << 20
+
+    async def _make(self, host, port, timeout, count):
+        scope = AsyncScope(host, port, timeout, count=count)
+        await scope.open()
+        return scope
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    @property
+    def timeout(self):
+        return int(self._scope.timeout * 1000)
+
+    @timeout.setter
+    def timeout(self, ms):
+        self._scope.timeout = ms / 1000.0
+
+    def write(self, cmd):
+        self._run(self._scope.write(cmd))
+
+    def query(self, cmd):
+        return self._run(self._scope.query(cmd))
+
+    def query_many(self, cmds):
+        return self._run(self._scope.query_many(cmds))
+
+    def read_line(self):
+        return self._run(self._scope.read_line())
+
+    def read_block(self):
+        return self._run(self._scope.read_block())
+
+    def clear(self):
+        self._run(self._scope.clear())
+
+    def close(self):
+        self._run(self._scope.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=1)
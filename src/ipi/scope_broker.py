@@ -0,0 +1,173 @@
+"""
+Scope broker: the one process that talks to the scope.
+
+Scripts that would otherwise each open the instrument (and garble each other's
+transfers) connect here instead, through scope_io.open_scope(..., transport=
+"broker"), and submit jobs (see broker_client for the format). A single scope
+thread runs jobs one at a time, lowest priority number first and in arrival
+order within a priority, so measurement polls (PRIO_POLL) slot in between the
+blocks of a bulk waveform read (PRIO_BULK) instead of waiting for a whole burst.
+
+Jobs from different clients may interleave, so :WAVeform settings (source,
+sequence, start/points, width...) written by a client are remembered and
+written again before its next job whenever another client used the scope in
+between. Acquisition settings (:ACQ, :TRIG, :RUN/:STOP) are shared: clients
+that run together have to agree on them.
+
+    python scope_broker.py [--resource ...] [--transport visa|socket] [--port 11790]
+"""
+import argparse
+import itertools
+import queue
+import socket
+import threading
+import time
+
+from scope_io import open_scope
+from broker_client import BROKER_PORT, send_msg, recv_msg
+from scope_config import scpi_key
+
+SCOPE_RESOURCE = "TCPIP0::10.11.13.220::5025::SOCKET"
+BLOCK_RING = 4      # blocks of one job passed on without a copy
+
+class _Client:
+    def __init__(self, conn, addr):
+        self.conn = conn
+        self.addr = addr
+        self.context = {}       # scpi_key -> last :WAVeform command
+        self.jobs = 0
+
+    def remember(self, cmd):
+        for part in cmd.split(";"):
+            part = part.strip()
+            if part and "?" not in part and scpi_key(part).startswith(":WAV:"):
+                self.context[scpi_key(part)] = part
+
+class ScopeBroker:
+    def __init__(self, resource=SCOPE_RESOURCE, transport="visa", port=BROKER_PORT, timeout=10000):
+        self.scope, self.reader = open_scope(resource, transport, timeout, count=BLOCK_RING)
+        self.port = port
+        self._jobs = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._last = None
+        self._shutdown = False
+
+    def serve_forever(self):
+        worker = threading.Thread(target=self._scope_thread, daemon=True)
+        worker.start()
+
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(("127.0.0.1", self.port))
+        listener.listen()
+        listener.settimeout(1.0)
+        print(f"Scope broker listening on 127.0.0.1:{self.port}")
+        try:
+            while not self._shutdown:
+                try:
+                    conn, addr = listener.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                threading.Thread(target=self._client_thread, args=(_Client(conn, addr),), daemon=True).start()
+        finally:
+            listener.close()
+
+    def close(self):
+        self._shutdown = True
+        self._jobs.put((-1, -1, None, None, None))
+        time.sleep(0.1)
+        self.scope.close()
+
+    # ---- clients ----
+    def _client_thread(self, client):
+        print(f"Client connected: {client.addr}")
+        try:
+            while not self._shutdown:
+                msg = recv_msg(client.conn)
+                if msg is None:
+                    break
+                header, _ = msg
+                # one job per client in flight, so its replies stay in order
+                done = threading.Event()
+                self._jobs.put((int(header.get("prio", 0)), next(self._order), client, header["ops"], done))
+                done.wait()
+        except OSError:
+            pass
+        finally:
+            client.conn.close()
+            print(f"Client disconnected: {client.addr} ({client.jobs} jobs)")
+
+    # ---- scope ----
+    def _scope_thread(self):
+        while True:
+            _, _, client, ops, done = self._jobs.get()
+            if client is None:
+                return
+            try:
+                header, payloads = self._run(client, ops)
+            except Exception as e:
+                header, payloads = {"results": [], "blocks": [], "error": str(e)}, []
+                self._recover()
+            try:
+                send_msg(client.conn, header, payloads)
+            except OSError:
+                pass        # client went away, its thread cleans up
+            client.jobs += 1
+            done.set()
+
+    def _run(self, client, ops):
+        if client is not self._last and client.context:
+            self.scope.write(";".join(client.context.values()))
+        self._last = client
+
+        results, payloads = [], []
+        copy = sum(kind == "b" for kind, _ in ops) > BLOCK_RING
+        for kind, cmd in ops:
+            if kind == "w":
+                self.scope.write(cmd)
+                client.remember(cmd)
+                results.append(None)
+            elif kind == "q":
+                self.scope.write(cmd)
+                client.remember(cmd)
+                results.append(self.reader.read_line())
+            elif kind == "b":
+                self.scope.write(cmd)
+                client.remember(cmd)
+                block = self.reader.read_block()
+                payloads.append(bytes(block) if copy else block)
+                results.append(len(payloads) - 1)
+            elif kind == "c":
+                self.scope.clear()
+                results.append(None)
+            else:
+                raise ValueError(f"Unknown op: {kind}")
+        return {"results": results, "blocks": [len(p) for p in payloads], "error": None}, payloads
+
+    def _recover(self):
+        # a failed read leaves the stream out of step for everybody
+        try:
+            self.scope.clear()
+        except Exception as e:
+            print(f"Clear after failed job failed too: {e}")
+        self._last = None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--resource", default=SCOPE_RESOURCE)
+    ap.add_argument("--transport", default="visa", choices=("visa", "socket"))
+    ap.add_argument("--port", type=int, default=BROKER_PORT)
+    args = ap.parse_args()
+
+    broker = ScopeBroker(args.resource, args.transport, args.port)
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.close()
+
+if __name__ == "__main__":
+    main()
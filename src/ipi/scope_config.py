@@ -0,0 +1,116 @@
+"""
+Declarative scope settings that only send what changed.
+
+A profile is an ordered dict of SCPI header -> value. ScopeConfig remembers the
+last value it sent for every setting (keyed by the short-form header, so
+":TRIGger:EDGE:SLOPe" and ":TRIG:EDGE:SLOP" are the same setting) and
+apply() writes just the entries that differ, joined into ';' batches. Going
+from the "measurement" profile to "snapshot" and back costs the timebase
+and waveform settings, not the whole setup.
+
+The cache only knows what went through it: after *RST, a reconnect, or someone
+turning knobs on the front panel, call forget().
+"""
+MAX_BATCH_CHARS = 512   # well under the scope's input buffer
+
+# Phase/skew monitoring of laser (C3) vs chopper (C2), triggered on the laser
+MEASUREMENT_PROFILE = {
+    ":CHANnel1:VISible": "ON",
+    ":CHANnel2:VISible": "ON",
+    ":CHANnel3:VISible": "ON",
+    ":ACQuire:MODE": "RT",              # Real-time acquisition
+    ":ACQuire:SRATe": "200E6",          # 200 MSa/s Sampling Rate
+    ":TIMebase:SCALe": "5e-3",          # 5ms per division
+    ":TIMebase:DELay": "8e-3",
+    ":TRIGger:MODE": "NORM",
+    ":TRIGger:TYPE": "EDGE",
+    ":TRIGger:EDGE:SLOPe": "RIS",
+    ":TRIGger:EDGE:LEVel": "3.00",
+    ":TRIGger:COUPling": "DC",          # DC coupling as shown on screen
+    ":TRIGger:EDGE:SOURce": "C3",
+    ":ACQuire:MDEPth": "10k",
+    ":MEASure": "ON",
+    ":MEASure:MODE": "ADVanced",
+    ":MEASure:ADVanced:STYle": "M2",
+    ":MEASure:ADVanced:LINenumber": "12",
+    ":MEASure:ADVanced:P1": "ON",
+    ":MEASure:ADVanced:P2": "ON",
+    ":MEASure:ADVanced:P3": "ON",
+    ":MEASure:ADVanced:P1:TYPE": "PHA",
+    ":MEASure:ADVanced:P2:TYPE": "SKEW",
+    ":MEASure:ADVanced:P1:SOURce1": "C3",     # laser vs chopper
+    ":MEASure:ADVanced:P1:SOURce2": "C2",
+    ":MEASure:ADVanced:P2:SOURce1": "C3",
+    ":MEASure:ADVanced:P2:SOURce2": "C2",
+}
+
+# Full-resolution C1 trace; everything else stays as in the measurement profile
+SNAPSHOT_PROFILE = dict(MEASUREMENT_PROFILE, **{
+    ":TIMebase:SCALe": "2e-4",
+    ":TIMebase:DELay": "1e-6",
+    ":WAVeform:STARt": "0",
+    ":WAVeform:SOURce": "C1",
+    ":WAVeform:INTerval": "0",
+})
+
+PROFILES = {
+    "measurement": MEASUREMENT_PROFILE,
+    "snapshot": SNAPSHOT_PROFILE,
+}
+
+def scpi_key(cmd):
+    """
+    Short-form header of a command, e.g. ':WAVeform:SOURce C1' and 'wav:sour C2'
+    -> ':WAV:SOUR'. A mixed-case node keeps its uppercase letters and digits
+    (the SCPI short form, so ':STYle' and ':STY' match); a node written all in
+    one case is taken to be the short form already.
+    """
+    nodes = []
+    for node in cmd.split()[0].strip(":").split(":"):
+        if node != node.upper() and node != node.lower():
+            node = "".join(c for c in node if not c.islower())
+        nodes.append(node.upper())
+    return ":" + ":".join(nodes)
+
+class ScopeConfig:
+    def __init__(self, scope):
+        self.scope = scope
+        self.sent = {}          # scpi_key -> value last written
+        self.writes = 0         # settings actually sent, for comparing runs
+
+    def apply(self, desired, actions=()):
+        """
+        Bring the scope to `desired` (header -> value, or a PROFILES name),
+        sending only settings that differ from what was last sent. `actions`
+        (e.g. ":RUN", a query) ride along at the end of the last batch.
+        Returns the number of settings sent.
+        """
+        if isinstance(desired, str):
+            desired = PROFILES[desired]
+        cmds = []
+        for header, value in desired.items():
+            key, value = scpi_key(header), str(value).strip()
+            if self.sent.get(key) != value:
+                cmds.append(f"{header} {value}")
+                self.sent[key] = value
+        self._write(cmds + list(actions))
+        self.writes += len(cmds)
+        return len(cmds)
+
+    def forget(self, header=None):
+        if header is None:
+            self.sent.clear()
+        else:
+            self.sent.pop(scpi_key(header), None)
+
+    def _write(self, cmds):
+        batch = ""
+        for cmd in cmds:
+            if not cmd.startswith((":", "*")):
+                cmd = ":" + cmd     # after ';' a header without ':' would be relative
+            if batch and len(batch) + 1 + len(cmd) > MAX_BATCH_CHARS:
+                self.scope.write(batch)
+                batch = ""
+            batch = f"{batch};{cmd}" if batch else cmd
+        if batch:
+            self.scope.write(batch)
@@ -0,0 +1,172 @@
+import socket
+from pyvisa import ResourceManager, constants
+from scope_async import SocketScope
+from broker_client import BrokerScope
+
+# Enough for "C1:WF DAT2," / "DESC," style prefixes plus leftover CR/LF
+PREFIX_LIMIT = 256
+LINE_LIMIT = 4096
+
+class BlockReader:
+    """
+    Buffered reader for IEEE-488.2 definite-length blocks (#<n><len><payload>).
+
+    Works on a pyvisa resource or on a plain connected socket. The payload is
+    received straight into a preallocated bytearray and handed back as a
+    memoryview, so np.frombuffer() can wrap it without another copy.
+
+    count > 1 keeps a ring of buffers: a view returned by read_block() stays
+    valid until `count` more blocks have been read. Trailing CR/LF after a block
+    is not drained (that used to cost one timeout per block); it is skipped by
+    the next read_line()/read_block() instead.
+    """
+
+    def __init__(self, inst, size=1 << 20, count=1):
+        self.inst = inst
+        self._is_socket = isinstance(inst, socket.socket)
+        self._bufs = [bytearray(size) for _ in range(count)]
+        self._next = 0
+        # read-ahead for raw sockets (recv() may return more than we asked for)
+        self._pending = bytearray()
+
+    # ---- public ----
+    def read_line(self):
+        """Read one ASCII response line, skipping blank lines left over from blocks."""
+        while True:
+            if self._is_socket:
+                raw = self._socket_read_until(b'\n', LINE_LIMIT)
+            else:
+                raw = self._visa_read_until('\n', LINE_LIMIT)
+            line = raw.decode('ascii', 'ignore').strip()
+            if line:
+                return line
+
+    def read_block(self):
+        """Read one block; returns a memoryview of exactly the payload length."""
+        if self._is_socket:
+            self._socket_read_until(b'#', PREFIX_LIMIT)
+            n = self._socket_read_length()
+        else:
+            self._visa_read_until('#', PREFIX_LIMIT)
+            nd = int(self.inst.read_bytes(1))
+            n = int(self.inst.read_bytes(nd))
+
+        view = self._reserve(n)
+        if self._is_socket:
+            self._socket_read_into(view)
+        else:
+            self._visa_read_into(view)
+        return view
+
+    # ---- buffers ----
+    def _reserve(self, n):
+        i = self._next
+        self._next = (i + 1) % len(self._bufs)
+        if len(self._bufs[i]) < n:
+            # Don't resize in place: numpy arrays from older blocks may still
+            # reference the old buffer, they keep it alive on their own.
+            self._bufs[i] = bytearray(max(n, 2 * len(self._bufs[i])))
+        return memoryview(self._bufs[i])[:n]
+
+    # ---- pyvisa ----
+    def _visa_read_until(self, char, limit):
+        inst = self.inst
+        old_rt = inst.read_termination
+        inst.read_termination = char
+        try:
+            raw = inst.read_bytes(limit, break_on_termchar=True)
+        finally:
+            inst.read_termination = old_rt
+        if not raw.endswith(char.encode()):
+            raise IOError(f"No {char!r} within {limit} bytes: {raw[:40]!r}")
+        return raw
+
+    def _visa_read_into(self, view):
+        inst = self.inst
+        old_rt = inst.read_termination
+        if old_rt:
+            inst.read_termination = None   # binary payload may contain LF
+        got = 0
+        try:
+            with inst.ignore_warning(constants.StatusCode.success_device_not_present,
+                                     constants.StatusCode.success_max_count_read):
+                while got < len(view):
+                    chunk, _ = inst.visalib.read(inst.session, min(inst.chunk_size, len(view) - got))
+                    view[got:got + len(chunk)] = chunk
+                    got += len(chunk)
+        finally:
+            if old_rt:
+                inst.read_termination = old_rt
+
+    # ---- raw socket ----
+    def _socket_fill(self, limit):
+        chunk = self.inst.recv(max(limit, 4096))
+        if not chunk:
+            raise ConnectionError("scope closed the connection")
+        self._pending += chunk
+
+    def _socket_read_until(self, char, limit):
+        while True:
+            i = self._pending.find(char)
+            if i >= 0:
+                raw = bytes(self._pending[:i + 1])
+                del self._pending[:i + 1]
+                return raw
+            if len(self._pending) > limit:
+                raise IOError(f"No {char!r} within {limit} bytes: {bytes(self._pending[:40])!r}")
+            self._socket_fill(limit)
+
+    def _socket_read_length(self):
+        while len(self._pending) < 1:
+            self._socket_fill(16)
+        nd = int(self._pending[:1])
+        while len(self._pending) < 1 + nd:
+            self._socket_fill(16)
+        n = int(self._pending[1:1 + nd])
+        del self._pending[:1 + nd]
+        return n
+
+    def _socket_read_into(self, view):
+        # whatever came along with the header goes first, the rest lands directly
+        got = min(len(self._pending), len(view))
+        view[:got] = self._pending[:got]
+        del self._pending[:got]
+        while got < len(view):
+            r = self.inst.recv_into(view[got:])
+            if r == 0:
+                raise ConnectionError("scope closed the connection")
+            got += r
+
+def open_scope(resource, transport="visa", timeout=10000, count=1):
+    """
+    Open the scope and return (scope, reader).
+
+    transport="visa" opens `resource` with pyvisa and wraps it in a
+    BlockReader. transport="socket" talks to the raw SCPI port through
+    scope_async.SocketScope (host/port taken from a ...::<port>::SOCKET
+    resource string); that object is both scope and reader.
+    transport="broker" goes through a running scope_broker instead (resource is
+    ignored, the broker owns the connection); also both scope and reader.
+    """
+    if transport == "broker":
+        scope = BrokerScope(timeout=timeout)
+        return scope, scope
+    if transport == "socket":
+        host, port = parse_socket_resource(resource)
+        scope = SocketScope(host, port, timeout=timeout, count=count)
+        return scope, scope
+    if transport != "visa":
+        raise ValueError(f"Unknown transport: {transport}")
+
+    scope = ResourceManager().open_resource(resource)
+    scope.write_termination = '\n'
+    scope.read_termination = None
+    scope.timeout = timeout
+    return scope, BlockReader(scope, count=count)
+
+def parse_socket_resource(resource):
+    # "TCPIP0::10.11.13.220::5025::SOCKET" -> ("10.11.13.220", 5025)
+    parts = resource.split("::")
+    if len(parts) != 4 or not parts[0].upper().startswith("TCPIP") or parts[3].upper() != "SOCKET":
+        raise ValueError(f"Not a raw socket resource: {resource}")
+    return parts[1], int(parts[2])
@@ -1,11 +1,20 @@
 import socket
-import pyvisa
 import threading
 import time
+from scope_io import open_scope
+from broker_client import PRIO_POLL
+from scope_config import ScopeConfig
+from meas_group import MeasGroup
 
 SERVER_INCOMING_PORT_NUM = 11780
+SCOPE_USB = "USB0::0xF4EC::0x100C::SDS2HBAX900425::INSTR"
+SCOPE_IP = "TCPIP0::10.11.13.220::5025::SOCKET"
+SCOPE_TRANSPORT = "visa"    # "socket" uses the asyncio raw-socket transport (needs SCOPE_IP),
+                            # "broker" shares the scope with other scripts through scope_broker
+
 class ScopeServer:
-    def __init__(self):
+    def __init__(self, transport=SCOPE_TRANSPORT):
+        self.__transport = transport
         self.__sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.__get_scope()
         self.__setup_measure()
@@ -30,56 +39,20 @@ class ScopeServer:
 
     def __get_scope(self):
         print("Attempting to connect to scope...")
-        rm = pyvisa.ResourceManager()
-        scope_usb = "USB0::0xF4EC::0x100C::SDS2HBAX900425::INSTR"
-        scope_ip = "TCPIP0::10.11.13.220::5025::SOCKET"
-        self.scope = rm.open_resource(scope_usb)
+        resource = SCOPE_IP if self.__transport == "socket" else SCOPE_USB
+        self.scope, self.__reader = open_scope(resource, self.__transport)
+        if self.__transport == "broker":
+            self.scope.priority = PRIO_POLL     # measurement polls go ahead of waveform transfers
         self.scope.timeout = 1000
         self.scope.write_termination = '\n'
         self.scope.read_termination  = '\n'
         print("Conencted!")
 
     def __setup_measure(self):
-        # one-time setup
-        #scope.write(":CHAN1:DISP ON; :CHAN2:DISP ON; :CHAN3:DISP ON")
-        #scope.write(":TRIG:MODE NORM; :TRIG:EDGE:SOUR C3; :TRIG:EDGE:SLOP RIS")
-
-        self.scope.write(f":CHAN{1}:VIS ON")  # Enable selected channel
-        self.scope.write(f":CHAN{2}:VIS ON")  # Enable selected channel
-        self.scope.write(f":CHAN{3}:VIS ON")  # Enable selected channel
-
-        self.scope.write(":ACQ:MODE RT")         # Real-time acquisition
-        self.scope.write(":ACQ:SRAT 200E6")      # 200 MSa/s Sampling Rate
-        self.scope.write(":ACQ:MDEP 10M")        # Match screen memory depth (10Mpts)  
-        self.scope.write(":TIMebase:SCALe 5e-3")       # 5ms per division
-        self.scope.write(":TIMebase:DELay 8e-3")       # 5ms per division
-
-        # Trigger settings
-        self.scope.write(":TRIG:MODE NORM")  
-        self.scope.write(":TRIG:TYPE EDGE")  
-        self.scope.write(":TRIGger:EDGE:SLOPe RIS")  
-        self.scope.write(":TRIGger:EDGE:LEVel 3.00")  
-        self.scope.write(":TRIGger:COUPling DC")  # DC coupling as shown on screen  
-        self.scope.write(":TRIGger:EDGE:SOUR C3")  # DC coupling as shown on screen  
-        self.scope.write(f":ACQ:MDEP 10k")
-
-        self.scope.write(":MEASure ON")
-        self.scope.write(":MEASure:MODE ADVanced")
-        self.scope.write(":MEASure:ADVanced:STYle M2")
-        self.scope.write(":MEASure:ADVanced:LINenumber 12")
-        self.scope.write(":MEASure:ADVanced:P1 ON")
-        self.scope.write(":MEASure:ADVanced:P2 ON")
-        self.scope.write(":MEASure:ADVanced:P3 ON")
-
-        self.scope.write(":MEASure:ADVanced:P1:TYPE PHA")
-        self.scope.write(":MEASure:ADVanced:P2:TYPE SKEW")
-
-        
-        self.scope.write(":MEASure:ADVanced:P1:SOURce1 C3")  # laser vs chopper
-        self.scope.write(":MEASure:ADVanced:P1:SOURce2 C2")
-
-        self.scope.write(":MEASure:ADVanced:P2:SOURce1 C3")  # laser vs chopper
-        self.scope.write(":MEASure:ADVanced:P2:SOURce2 C2")
+        # one-time setup, see scope_config.MEASUREMENT_PROFILE
+        self.__config = ScopeConfig(self.scope)
+        self.__config.apply("measurement")
+        self.__meas = MeasGroup(self.scope, range(1, 8), self.__reader)
 
 
     def __server_thread(self):
@@ -119,23 +92,14 @@ class ScopeServer:
             self.__read_start()
             time.sleep(0.1)
 
-        dt, ph, vpp, filt, avg_vpp, amplitude, rms  = float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan')
-        try:
-            ph = float(self.scope.query(":MEASure:ADVanced:P1:VALue?"))
-            dt = float(self.scope.query(":MEASure:ADVanced:P2:VALue?"))
-            vpp = float(self.scope.query(":MEASure:ADVanced:P3:VALue?"))
-            filt = float(self.scope.query(":MEASure:ADVanced:P4:VALue?"))
-            avg_vpp = float(self.scope.query(":MEASure:ADVanced:P5:VALue?"))
-            amplitude = float(self.scope.query(":MEASure:ADVanced:P6:VALue?"))
-            rms = float(self.scope.query(":MEASure:ADVanced:P7:VALue?"))
-
-            if ph > 360:
-                ph -= 360
-
-            if ph < 0:
-                ph += 360
-        except ValueError:
-            pass
+        # P1..P7 in one round trip, nan where the scope has no valid value
+        ph, dt, vpp, filt, avg_vpp, amplitude, rms = self.__meas.read()
+
+        if ph > 360:
+            ph -= 360
+
+        if ph < 0:
+            ph += 360
 
         data = f"{time.time()},{dt*1e3},{ph},{vpp},{filt},{avg_vpp},{amplitude},{rms}".encode("utf-8")
 
@@ -0,0 +1,411 @@
+"""
+SDS2000X HD simulator: a local TCP server speaking the SCPI subset the
+acquisition scripts use, so they (and their benchmarks) run without the scope.
+
+    python sds_sim.py [--port 5025] [--mbps 8] [--pulse-rate 100] [--points 20000]
+
+then point SCOPE_RESOURCE at "TCPIP0::127.0.0.1::5025::SOCKET".
+
+What it models:
+  - a free-running laser: pulses every 1 / pulse_rate s, with optional trigger
+    jitter and a share of missed triggers (deterministic per pulse index, so
+    every reader sees the same pulses)
+  - sequence capture: :ACQuire:SEQuence ON/:COUNt N, armed by :TRIGger:MODE
+    SINGle + :TRIGger:RUN (or :SINGle), is done `arm_ms` after arming plus N
+    triggers; :TRIGger:STATus? says Stop from then on, *OPC? waits for it.
+    :RUN with sequence on keeps cycling through the sequence memory (history
+    reads), :STOP freezes it.
+  - :WAVeform:PREamble? as a WAVEDESC (wavedesc.pack) with the timestamp table,
+    :WAVeform:DATA? in BYTE or WORD honouring :WAVeform:SEQuence, :STARt,
+    :POINt and :INTerval, sent at `mbps` with `latency_ms` before every reply.
+    :WAVeform:SEQuence <frame>,<start>: frame > 0 reads that one frame, 0 reads
+    from frame start on, as many whole frames as fit in :WAVeform:MAXPoint?
+    points (read_frame in the preamble says how many)
+  - :MEASure:ADVanced:Pn:VALue? around fixed values (phase, skew, Vpp ...)
+  - every other "HEADER value" is stored and answered by "HEADER?"
+';'-joined commands work as on the scope: the query answers come back as one
+';'-separated line, blocks follow each other.
+"""
+import argparse
+import math
+import re
+import socket
+import threading
+import time
+import numpy as np
+
+import wavedesc
+from scope_config import scpi_key
+
+IDN = "Siglent Technologies,SDS2104X HD,SIMULATOR,1.0"
+CODE_RAW = 25 * 256     # 25 codes/div for BYTE, 400 for the 12-bit WORD codes
+BANK_FRAMES = 16        # distinct frames, reused round-robin
+CHUNK_FRAMES = 64       # frames generated at a time while streaming DATA?
+SEND_BYTES = 64 << 10   # bandwidth pacing granularity
+
+# :MEASure:ADVanced:Pn -> (value, noise); the order ScopeServer reads them in
+MEAS_VALUES = {
+    1: (12.0, 0.5),         # phase, deg
+    2: (3.3e-4, 1e-5),      # skew, s
+    3: (0.31, 0.01),        # Vpp
+    4: (0.30, 0.005),
+    5: (0.31, 0.002),
+    6: (0.29, 0.01),        # amplitude
+    7: (0.05, 0.002),       # rms
+}
+
+# the headers handled specially, in the short form scpi_key() gives every incoming header
+_PRE = scpi_key(":WAVeform:PREamble")
+_DATA = scpi_key(":WAVeform:DATA")
+_TRIG_STATUS = scpi_key(":TRIGger:STATus")
+_TRIG_MODE = scpi_key(":TRIGger:MODE")
+_TRIG_RUN = scpi_key(":TRIGger:RUN")
+_SINGLE = scpi_key(":SINGle")
+_RUN = scpi_key(":RUN")
+_WAV = scpi_key(":WAVeform") + ":"
+_STOP = scpi_key(":STOP")
+_ACQ_POINTS = scpi_key(":ACQuire:POINts")
+_MAX_POINT = scpi_key(":WAVeform:MAXPoint")
+_MEAS_VALUE = re.compile(re.escape(scpi_key(":MEASure:ADVanced")) + r":P(\d+):" + re.escape(scpi_key(":VALue")[1:]) + "$")
+
+def _hash01(k):
+    # cheap deterministic uniform [0, 1) per pulse index
+    return ((np.asarray(k, dtype=np.uint64) * np.uint64(2654435761)) % np.uint64(1 << 32)) / float(1 << 32)
+
+class SimScope:
+    """Acquisition state shared by all connections."""
+
+    def __init__(self, pulse_rate=100.0, points=20000, srate=2e9, jitter_us=0.0, miss=0.0, arm_ms=20.0,
+                 pulse_at=0.3, pulse_ns=20.0, amplitude=0.3, noise=0.002, seed=0, max_read_points=None):
+        self.period = 1.0 / pulse_rate
+        self.points = points
+        self.max_read_points = max_read_points or points * 1000    # points per DATA? read
+        self.srate = srate
+        self.jitter = jitter_us * 1e-6
+        self.miss = miss
+        self.arm_s = arm_ms / 1000.0
+        self.epoch0 = time.time()
+        self.lock = threading.Lock()
+
+        self.settings = {scpi_key(k): v for k, v in (
+            (":WAVeform:WIDTh", "BYTE"), (":WAVeform:INTerval", "1"), (":WAVeform:STARt", "0"),
+            (":WAVeform:POINt", "0"), (":WAVeform:SEQuence", "0,1"), (":WAVeform:SOURce", "C1"),
+            (":ACQuire:SEQuence", "OFF"), (":ACQuire:SEQuence:COUNt", "1"), (":TRIGger:MODE", "AUTO"),
+            (":TIMebase:SCALe", "1e-6"), (":CHANnel1:SCALe", "0.5"), (":CHANnel1:OFFSet", "0"))}
+
+        self.running = True
+        self.single = False
+        self.t_start = self.epoch0      # run or arm time
+        self.t_stop = None              # frozen at :STOP / end of a single sequence
+        self.frames = np.empty(0)       # trigger times of the single sequence
+
+        self._bank = self._make_bank(seed, pulse_at, pulse_ns, amplitude, noise)
+        self.rng = np.random.default_rng(seed + 1)
+
+    # ---- waveforms ----
+    def _make_bank(self, seed, pulse_at, pulse_ns, amplitude, noise):
+        rng = np.random.default_rng(seed)
+        t = np.arange(self.points) / self.srate
+        t0 = pulse_at * self.points / self.srate
+        shape = np.exp(-0.5 * ((t - t0) / (pulse_ns * 1e-9 / 2.355)) ** 2)
+        amps = amplitude * (1 + 0.05 * rng.standard_normal(BANK_FRAMES))
+        V = amps[:, None] * shape + noise * rng.standard_normal((BANK_FRAMES, self.points))
+        vdiv = float(self.get(":CHANnel1:SCALe", "0.5"))
+        codes = np.rint((V + float(self.get(":CHANnel1:OFFSet", "0"))) / vdiv * (CODE_RAW / 16))
+        return np.clip(codes, -2048, 2047).astype(np.int16)
+
+    def get(self, header, default=None):
+        return self.settings.get(scpi_key(header), default)
+
+    # ---- trigger model ----
+    def _triggers(self, t_from, t_to=None, n=None):
+        """Times of captured triggers after t_from: up to t_to, or the first n."""
+        k0 = math.ceil((t_from - self.epoch0) / self.period)
+        if n is not None:
+            # enough pulse slots for n captures at this miss rate
+            k = np.arange(k0, k0 + int(n / max(1.0 - self.miss, 0.01) * 1.2) + 16)
+        else:
+            k = np.arange(k0, math.floor((t_to - self.epoch0) / self.period) + 1)
+        k = k[_hash01(k) >= self.miss]
+        t = self.epoch0 + k * self.period + self.jitter * (_hash01(k + 7919) - 0.5)
+        return t[:n] if n is not None else t
+
+    def _seq_count(self):
+        return max(int(self.get(":ACQuire:SEQuence:COUNt", "1")), 1) if self.get(":ACQuire:SEQuence", "OFF").upper() == "ON" else 1
+
+    def arm_single(self):
+        n = self._seq_count()
+        self.single, self.running = True, False
+        self.t_start = time.time()
+        self.frames = self._triggers(self.t_start + self.arm_s, n=n)
+        self.t_stop = self.frames[-1]
+
+    def run(self):
+        self.single, self.running = False, True
+        self.t_start, self.t_stop = time.time(), None
+
+    def stop(self):
+        now = time.time()
+        if self.running:
+            self.t_stop = now
+        elif self.single and self.t_stop > now:
+            # aborts the sequence with the frames captured so far
+            self.frames = self.frames[self.frames <= now]
+            self.t_stop = now
+        self.running = False
+
+    def stopped(self):
+        return not self.running and (self.t_stop is None or time.time() >= self.t_stop)
+
+    def memory(self):
+        """Trigger times of the frames in sequence memory right now."""
+        now = time.time()
+        if self.single:
+            return self.frames[self.frames <= now]
+        t = self._triggers(self.t_start, self.t_stop if self.t_stop is not None else now)
+        count = self._seq_count()
+        # the sequence memory refills from frame 1 once it is full
+        return t[(len(t) - 1) // count * count:] if len(t) else t
+
+    # ---- transfers ----
+    def selection(self):
+        """What PREamble?/DATA? describe now: (frame times, frame indexes, start, interval, points)."""
+        with self.lock:
+            return self._selection()
+
+    def _selection(self):
+        mem = self.memory()
+        interval = max(int(float(self.get(":WAVeform:INTerval", "1"))), 1)
+        first = int(float(self.get(":WAVeform:STARt", "0")))
+        n_pts = len(range(first, self.points, interval))
+        want = int(float(self.get(":WAVeform:POINt", "0")))
+        if want > 0:
+            n_pts = min(n_pts, want)
+
+        frame, _, start = self.get(":WAVeform:SEQuence", "0,1").partition(",")
+        frame, start = int(frame or 0), int(start or 1)
+        if frame > 0:
+            idx = np.arange(frame - 1, min(frame, len(mem)))
+        else:
+            per_read = max(self.max_read_points // max(n_pts, 1), 1)
+            idx = np.arange(max(start, 1) - 1, min(max(start, 1) - 1 + per_read, len(mem)))
+        return mem, idx, first, interval, n_pts
+
+    def preamble(self, sel):
+        mem, idx, first, interval, n_pts = sel
+        with self.lock:
+            width = 0 if self.get(":WAVeform:WIDTh", "BYTE").upper().startswith("BYTE") else 1
+            tdiv = float(self.get(":TIMebase:SCALe", "1e-6"))
+            wd = wavedesc.WaveDesc(
+                width=width, order=0, data_bytes=len(idx) * n_pts * (width + 1),
+                one_frame_pts=self.points, first_point=first, sparsing=interval,
+                read_frame=len(idx), sum_frame=len(mem), v_scale=float(self.get(":CHANnel1:SCALe", "0.5")),
+                v_offset=float(self.get(":CHANnel1:OFFSet", "0")), code_raw=CODE_RAW, adc_bit=12, sn=0,
+                interval=1.0 / self.srate, delay=0.0,
+                tdiv_index=int(np.argmin([abs(math.log(x / tdiv)) for x in wavedesc.TDIV_ENUM])), probe=1.0)
+            stamps = (mem[idx] * 1e9).astype(np.int64)
+        return wavedesc.pack(wd, wavedesc.timestamp_table(stamps))
+
+    def data_chunks(self, sel):
+        """(total bytes, generator of payload chunks) for DATA? of a selection."""
+        mem, idx, first, interval, n_pts = sel
+        with self.lock:
+            word = not self.get(":WAVeform:WIDTh", "BYTE").upper().startswith("BYTE")
+        cols = slice(first, first + n_pts * interval, interval)
+
+        def chunks():
+            for i in range(0, len(idx), CHUNK_FRAMES):
+                c = self._bank[idx[i:i + CHUNK_FRAMES] % BANK_FRAMES, cols]
+                yield (c << 4).astype("<i2").tobytes() if word else (c >> 4).astype(np.int8).tobytes()
+
+        return len(idx) * n_pts * (2 if word else 1), chunks()
+
+    def measurement(self, n):
+        value, noise = MEAS_VALUES.get(n, (9.9e37, 0.0))
+        return value + noise * self.rng.standard_normal()
+
+class _Connection:
+    def __init__(self, sim, conn, mbps, latency):
+        self.sim = sim
+        self.conn = conn
+        self.rate = mbps * 1e6 if mbps else None
+        self.latency = latency
+        # the frames a PREamble? described, so the DATA? after it matches
+        # even though a running acquisition moved on in between
+        self.selection = None
+
+    def serve(self):
+        f = self.conn.makefile("rb")
+        try:
+            for line in f:
+                line = line.decode("ascii", "ignore").strip()
+                if line:
+                    self.handle(line)
+        except OSError:
+            pass
+        finally:
+            self.conn.close()
+
+    def handle(self, line):
+        answers = []
+        for cmd in line.split(";"):
+            cmd = cmd.strip()
+            if not cmd:
+                continue
+            header, _, arg = cmd.partition(" ")
+            query = header.endswith("?")
+            key = header.rstrip("?").upper() if header.startswith("*") else scpi_key(header.rstrip("?"))
+            if key in (_PRE, _DATA) and query:
+                self._flush(answers)
+                if key == _PRE:
+                    self.selection = self.sim.selection()
+                    self._send_block(b"DESC,", self.sim.preamble(self.selection))
+                else:
+                    sel, self.selection = self.selection or self.sim.selection(), None
+                    self._send_stream(b"C1:WF DAT2,", *self.sim.data_chunks(sel))
+            else:
+                if key.startswith(_WAV) or key in (_RUN, _TRIG_RUN, _SINGLE, _TRIG_MODE):
+                    self.selection = None
+                reply = self.command(key, arg.strip(), query)
+                if reply is not None:
+                    answers.append(reply)
+        self._flush(answers)
+
+    def command(self, key, arg, query):
+        sim = self.sim
+        if key == "*OPC" and query:
+            # held until a running single sequence is complete, like the scope
+            with sim.lock:
+                wait = sim.t_stop - time.time() if sim.single else 0
+            if wait > 0:
+                time.sleep(wait)
+            return "1"
+
+        with sim.lock:
+            if key == "*IDN":
+                return IDN
+            if key in ("*RST", "*CLS"):
+                return None
+            if key == _TRIG_STATUS:
+                return "Stop" if sim.stopped() else ("Ready" if sim.single else "Auto")
+            if key == _TRIG_MODE and not query:
+                sim.settings[key] = arg
+                if arg.upper().startswith("SING"):
+                    sim.arm_single()
+                return None
+            if key in (_TRIG_RUN, _SINGLE):
+                if not sim.single or sim.stopped():
+                    sim.arm_single()
+                return None
+            if key == _RUN:
+                sim.run()
+                return None
+            if key == _STOP:
+                sim.stop()
+                return None
+            m = _MEAS_VALUE.match(key)
+            if m and query:
+                return f"{sim.measurement(int(m.group(1))):.6E}"
+            if key == _ACQ_POINTS and query:
+                return f"{sim.points:.2E}"
+            if key == _MAX_POINT and query:
+                return f"{sim.max_read_points:.2E}"
+            if query:
+                return sim.settings.get(key, "0")
+            sim.settings[key] = arg
+            return None
+
+    # ---- replies ----
+    def _flush(self, answers):
+        if answers:
+            self._pace_latency()
+            self.conn.sendall((";".join(answers) + "\n").encode())
+            answers.clear()
+
+    def _send_block(self, prefix, payload):
+        self._send_stream(prefix, len(payload), iter([payload]))
+
+    def _send_stream(self, prefix, n, chunks):
+        self._pace_latency()
+        self.conn.sendall(prefix + b"#9%09d" % n)
+        t0, sent = time.perf_counter(), 0
+        for chunk in chunks:
+            chunk = memoryview(chunk)
+            for i in range(0, len(chunk), SEND_BYTES):
+                piece = chunk[i:i + SEND_BYTES]
+                sent += len(piece)
+                if self.rate:
+                    # hold each piece back until the link would have carried it
+                    ahead = t0 + sent / self.rate - time.perf_counter()
+                    if ahead > 0:
+                        time.sleep(ahead)
+                self.conn.sendall(piece)
+        self.conn.sendall(b"\n\n")
+
+    def _pace_latency(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+class SdsSimulator:
+    """The TCP side: one thread per connection, one SimScope behind all of them."""
+
+    def __init__(self, port=5025, host="127.0.0.1", mbps=8.0, latency_ms=1.0, **scope_kw):
+        self.sim = SimScope(**scope_kw)
+        self.mbps = mbps
+        self.latency = latency_ms / 1000.0
+        self.srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.srv.bind((host, port))
+        self.srv.listen()
+        self.host, self.port = self.srv.getsockname()
+
+    @property
+    def resource(self):
+        return f"TCPIP0::{self.host}::{self.port}::SOCKET"
+
+    def start(self):
+        """Serve in a background thread (benchmarks); returns self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn, _ = self.srv.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            c = _Connection(self.sim, conn, self.mbps, self.latency)
+            threading.Thread(target=c.serve, daemon=True).start()
+
+    def close(self):
+        self.srv.close()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=5025)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--mbps", type=float, default=8.0, help="transfer bandwidth in MB/s, 0 = unlimited")
+    ap.add_argument("--latency-ms", type=float, default=1.0, help="delay before every reply")
+    ap.add_argument("--pulse-rate", type=float, default=100.0)
+    ap.add_argument("--points", type=int, default=20000, help="points per frame")
+    ap.add_argument("--srate", type=float, default=2e9)
+    ap.add_argument("--arm-ms", type=float, default=20.0, help="arm to first possible trigger")
+    ap.add_argument("--jitter-us", type=float, default=0.0)
+    ap.add_argument("--miss", type=float, default=0.0, help="share of pulses not triggered on")
+    ap.add_argument("--max-read-points", type=int, help="points per DATA? read (:WAVeform:MAXPoint?), default 1000 frames")
+    args = ap.parse_args()
+
+    sim = SdsSimulator(args.port, args.host, args.mbps, args.latency_ms, pulse_rate=args.pulse_rate,
+                       points=args.points, srate=args.srate, jitter_us=args.jitter_us, miss=args.miss,
+                       arm_ms=args.arm_ms, max_read_points=args.max_read_points)
+    print(f"SDS2000X HD simulator on {sim.resource}")
+    try:
+        sim.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Crash-safe snapshot segments, written behind the acquisition.
+
+SegmentWriter.add_burst() only hands a decoded burst over; a background
+thread appends it to the current segment, the file set process_snapshots reads:
+  snapshot_<stamp>.snap   codes + frame records (snapshot_file, append-only;
+                          codes compressed in chunks when a codec is given)
+  pulses_<stamp>.dat      first row, epoch s of every frame
+  bursts_<stamp>.csv      pulse_gaps burst rows
+  gaps_<stamp>.csv        pulse_gaps gap rows
+  chopper_<stamp>.csv     chopper samples received meanwhile
+and keeps the folder's manifest.json (see manifest) up to date as segments
+open and close.
+Every file is flushed after every burst, and add_burst hands a burst over
+only once the previous one is written and flushed, so a killed process
+loses at most the one burst handed over last (besides whatever the caller
+has read and not handed over yet). fsync goes out every fsync_s for power
+loss. A new segment starts once the current one holds segment_bytes or is
+segment_s old, or when the frame shape changes.
+"""
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+import manifest
+import pulse_gaps
+import snapshot_file
+from burst_records import ScaledCodes
+
+SEGMENT_S = 30.0
+SEGMENT_BYTES = 256 << 20
+FSYNC_S = 1.0
+
+BURST_FMT = ["%.9f", "%.9f", "%d", "%d", "%d", "%.9g"]
+GAP_FMT = ["%.9f", "%.9f", "%d"]
+
+class Segment:
+    """One open file set."""
+
+    def __init__(self, folder, stamp, meta, codec=None, level=None):
+        self.stamp = stamp
+        self.start = time.time()
+        self.bursts = []        # burst rows, for the coverage line
+        self.first_ns = self.last_ns = None
+        self.names = manifest.segment_files(stamp)
+
+        def path(name):
+            return os.path.join(folder, self.names[name])
+
+        self.snap = snapshot_file.SnapshotWriter(path("snapshot"), meta, codec, level)
+        self.pulses = open(path("pulses"), "w")
+        self.bursts_file = self._csv(path("bursts"), pulse_gaps.BURST_FIELDS)
+        self.gaps_file = self._csv(path("gaps"), pulse_gaps.GAP_FIELDS)
+        self.chopper = self._csv(path("chopper"), "t,phase,sync")
+
+    @staticmethod
+    def _csv(path, header):
+        f = open(path, "w")
+        f.write(header + "\n")
+        return f
+
+    @property
+    def files(self):
+        return (self.pulses, self.bursts_file, self.gaps_file, self.chopper)
+
+    def add_burst(self, t, burst, epochs_ns, burst_row, gap_rows):
+        first = self.snap.n_frames * (self.snap.n_points or burst.shape[1])
+        self.snap.add_burst(t, burst, epochs_ns)
+        rows = first + burst.shape[1] * np.arange(len(burst), dtype=np.int64)
+        for p, times in zip(rows.tolist(), (np.asarray(epochs_ns) / 1e9).tolist()):
+            self.pulses.write(f"{p},{times}\n")
+        if len(epochs_ns):
+            if self.first_ns is None:
+                self.first_ns = int(epochs_ns[0])
+            self.last_ns = int(epochs_ns[-1])
+        if burst_row is not None:
+            self.bursts.append(burst_row)
+            np.savetxt(self.bursts_file, [burst_row], delimiter=',', fmt=BURST_FMT)
+        if gap_rows:
+            np.savetxt(self.gaps_file, gap_rows, delimiter=',', fmt=GAP_FMT)
+
+    def add_chopper(self, rows):
+        if rows:
+            np.savetxt(self.chopper, rows, delimiter=',')
+
+    def flush(self, fsync=False):
+        self.snap.flush(fsync)
+        for f in self.files:
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+    def close(self):
+        self.snap.close()
+        for f in self.files:
+            f.close()
+
+    def entry(self):
+        """The manifest entry of this segment."""
+        snap = self.snap
+        return dict(self.names, stamp=self.stamp, complete=snap.closed, frames=snap.n_frames,
+                    points=snap.n_points, dtype=snap.dtype.str if snap.dtype is not None else None,
+                    codec=snap.codec, first_ns=self.first_ns, last_ns=self.last_ns,
+                    codes_offset=snapshot_file.HEADER_SIZE, table_offset=snap.table_offset,
+                    chunks_offset=snap.chunks_offset, bytes=snap.nbytes)
+
+    def summary(self):
+        captured = sum(b[2] for b in self.bursts)
+        fired = pulse_gaps.fired_pulses(self.bursts)
+        coverage = captured / fired if fired else float('nan')
+        codec = ""
+        if self.snap.codec:
+            speed = self.snap.raw_bytes / self.snap.codec_s / 1e6 if self.snap.codec_s else float('nan')
+            codec = f" ({self.snap.codec} {self.snap.ratio:.2f}x, {speed:.0f} MB/s)"
+        return (f"Saved {self.snap.path}: {self.snap.n_frames} pulses x {self.snap.n_points} points, "
+                f"{self.snap.nbytes / 1e6:.1f} MB{codec}, pulse coverage {coverage:.4f}")
+
+class SegmentWriter:
+    """
+    Writer thread over a folder's segments, fed one burst at a time. skip:
+    keep every skip-th frame. The handed-over codes are copies, so the caller's DATA? buffers can be
+    reused as soon as add_burst returns. codec / level: frame_codec
+    compression of the snapshots, None to write them plain.
+    """
+
+    def __init__(self, folder, meta=None, skip=1, segment_s=SEGMENT_S, segment_bytes=SEGMENT_BYTES,
+                 fsync_s=FSYNC_S, codec=None, level=None):
+        self.folder = folder
+        self.meta = dict(meta or {})
+        self.codec = codec
+        self.level = level
+        self.skip = max(int(skip), 1)
+        self.segment_s = segment_s
+        self.segment_bytes = segment_bytes
+        self.fsync_s = fsync_s
+        self.segment = None
+        self.segments = 0
+        self.manifest = manifest.Manifest(folder, self.meta)
+        self.error = None
+        self._last_stamp = 0
+        self._chopper = []
+        self.chopper_origin_ns = None   # host epoch ns the chopper t column counts from
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=1)
+        self._written = threading.Event()     # the last item handed over is written and flushed
+        self._written.set()
+        self._thread = threading.Thread(target=self._run, name="segment-writer", daemon=True)
+        self._thread.start()
+
+    def add_burst(self, t, burst, meta, epochs_ns, burst_row=None, gap_rows=()):
+        """Hand over one decoded burst (ScaledCodes) with its pulse_gaps rows; blocks until the previous one is flushed."""
+        if self.error is not None:
+            raise self.error
+        kept = burst[::self.skip]
+        kept = ScaledCodes(np.array(kept.codes), kept.scale, kept.offset)
+        if not self._put((t, kept, meta, np.array(epochs_ns[::self.skip]), burst_row, list(gap_rows))):
+            raise self.error or RuntimeError("segment writer has stopped")
+
+    def set_chopper_origin(self, epoch_ns):
+        """Epoch ns of chopper t = 0, recorded in the manifest entries."""
+        self.chopper_origin_ns = int(epoch_ns)
+
+    def add_chopper(self, row):
+        """One chopper sample (t, phase, sync), written with the next burst."""
+        with self._lock:
+            self._chopper.append(row)
+
+    def close(self):
+        """Write the last burst, close the last segment; returns at once if the writer already stopped."""
+        self._put(None)
+        self._thread.join()
+
+    def _put(self, item):
+        """Hand item over once the previous one is written, unless the writer thread is gone."""
+        while self._thread.is_alive():
+            if self._written.wait(self.fsync_s):
+                self._written.clear()
+                self._queue.put(item)
+                return True
+        return False
+
+    def _run(self):
+        last_sync = time.monotonic()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.fsync_s)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item:
+                    self._write(*item)
+                if self.segment is not None:
+                    sync = time.monotonic() - last_sync >= self.fsync_s
+                    self._drain_chopper()
+                    self.segment.flush(fsync=sync)
+                    if sync:
+                        last_sync = time.monotonic()
+                    if self.segment.snap.nbytes >= self.segment_bytes or time.time() - self.segment.start >= self.segment_s:
+                        self._roll()
+                self._written.set()
+        except Exception as e:
+            self.error = e
+            print(f"Segment writer stopped: {e!r}")
+        finally:
+            if self.segment is not None:
+                self._drain_chopper()
+                self._roll()
+
+    def _write(self, t, burst, meta, epochs_ns, burst_row, gap_rows):
+        seg = self.segment
+        if seg is not None and seg.snap.n_points is not None and \
+                (burst.shape[1] != seg.snap.n_points or burst.codes.dtype != seg.snap.dtype):
+            self._roll()
+        if self.segment is None:
+            stamp = max(int(time.time()), self._last_stamp + 1)    # one stamp per file set, never reused
+            self._last_stamp = stamp
+            self.segment = Segment(self.folder, stamp, dict(self.meta, wavedesc=meta), self.codec, self.level)
+            self.manifest.put(dict(self.segment.entry(), chopper_origin_ns=self.chopper_origin_ns))
+        self.segment.add_burst(t, burst, epochs_ns, burst_row, gap_rows)
+
+    def _drain_chopper(self):
+        with self._lock:
+            rows, self._chopper = self._chopper, []
+        self.segment.add_chopper(rows)
+
+    def _roll(self):
+        self.segment.close()
+        self.manifest.put(dict(self.segment.entry(), chopper_origin_ns=self.chopper_origin_ns))
+        print(self.segment.summary())
+        self.segment = None
+        self.segments += 1
@@ -0,0 +1,67 @@
+import wavedesc
+from scope_io import BlockReader
+
+def _decode_chunk(desc, data, interval):
+    """(t, V) for one DATA? payload: t shared by all frames, V shaped (read_frame, n_pts)."""
+    wd = wavedesc.parse(desc)
+    V = wavedesc.volts(wd, wavedesc.codes(wd, data))
+    return wavedesc.time_axis(wd, V.shape[1], interval), V
+
+def _request(scope, source, start):
+    # frame 0: read on from frame `start`, as many frames as fit in one read
+    scope.write(f":WAVeform:SOURce {source};:WAVeform:SEQuence 0,{start}")
+    scope.write(":WAVeform:PREamble?")
+    scope.write(":WAVeform:DATA?")
+
+def iter_sequence_frames(scope, source="C1", reader=None):
+    """
+    Yield (frame_number, t, volts) for every frame in sequence memory.
+
+    Frames are fetched in chunks with :WAVeform:SEQuence 0,<start>: the scope
+    returns as many frames from <start> on as fit in one read (at most
+    :WAVeform:MAXPoint? points) and says how many in the preamble's
+    read_frame. The request for chunk k+1 goes out
+    before chunk k is decoded and yielded, so the transfer overlaps with the
+    consumer. Memory stays at two raw chunks plus one decoded chunk however
+    many frames were acquired; `volts` is a row view into the decoded chunk,
+    copy it if it has to outlive the next chunk.
+    """
+    # two (PREamble, DATA) pairs: the chunk being consumed + the prefetched one
+    reader = reader if reader is not None else BlockReader(scope, count=4)
+
+    interval = int(float(scope.query(":WAVeform:INTerval?")))   # decimation DATA? transfers at
+    scope.write(f":WAVeform:SOURce {source};:WAVeform:SEQuence 0,1")
+    scope.write(":WAVeform:PREamble?")
+    sum_frame = wavedesc.parse(bytes(reader.read_block())).sum_frame
+    if sum_frame == 0:
+        return
+
+    start = 1
+    _request(scope, source, start)
+    in_flight = True
+    try:
+        while True:
+            desc = bytes(reader.read_block())
+            data = reader.read_block()
+            in_flight = False
+            read_frame = wavedesc.parse(desc).read_frame
+
+            next_start = start + read_frame
+            if read_frame and next_start <= sum_frame:
+                _request(scope, source, next_start)   # prefetch
+                in_flight = True
+
+            if read_frame:
+                t, V = _decode_chunk(desc, data, interval)
+                for i in range(read_frame):
+                    yield start + i, t, V[i]
+
+            if not in_flight:
+                return
+            start = next_start
+    except GeneratorExit:
+        # consumer stopped early: swallow the prefetched reply so the next query lines up
+        if in_flight:
+            reader.read_block()
+            reader.read_block()
+        raise
@@ -0,0 +1,359 @@
+"""
+Binary snapshot files (snapshot_<ts>.snap), the compact replacement for
+snapshot_<ts>.csv.
+
+Layout, little endian:
+  [0:8]       magic b"IPISNAP1"
+  [8:12]      uint32 length of the JSON header that follows
+  [12:...]    JSON header: n_frames, n_points, codes dtype, t0/dt of the frame
+              time axis, the WAVEDESC fields of the first burst, offsets below
+  [4096:...]  ADC codes, (n_frames, n_points) C order, int8 (BYTE) or int16 (WORD)
+  [table:...] one FRAME_DTYPE record per frame: epoch ns, volts-per-code, offset
+  [chunks:..] with a codec only: one CHUNK_DTYPE entry per compressed chunk
+so V = codes * scale[:, None] - offset[:, None] per frame (a
+burst_records.ScaledCodes, see SnapshotFile.scaled()), and every part can be
+memory-mapped.
+
+With a codec (header "codec", see frame_codec) the codes are stored as
+independently compressed chunks of whole frames instead; reading a frame
+decompresses only its chunk.
+
+Writing is append-only: while the file is open the frame records (and chunk
+entries) go to snapshot_<ts>.snap.frames (.chunks) sidecars, and close()
+moves them behind the codes and fills in the header. A file that was never
+closed (crash, kill) reads back as every frame that has both its codes and
+its record on disk.
+
+load_compat() returns the (labels, values) pair get_data() returns for the
+CSV, so the processing scripts take either format.
+"""
+import json
+import os
+import time
+import numpy as np
+
+import frame_codec
+from burst_records import ScaledCodes
+
+MAGIC = b"IPISNAP1"
+HEADER_SIZE = 4096
+VERSION = 1
+FRAMES_SUFFIX = ".frames"   # frame records of a file still being written
+CHUNKS_SUFFIX = ".chunks"   # chunk entries of a compressed file still being written
+
+FRAME_DTYPE = np.dtype([
+    ("epoch_ns", "<i8"),
+    ("scale", "<f8"),       # V per code
+    ("offset", "<f8"),      # V subtracted after scaling
+])
+
+CHUNK_DTYPE = np.dtype([
+    ("first_frame", "<i8"),
+    ("n_frames", "<i8"),
+    ("offset", "<i8"),      # of the compressed chunk in the file
+    ("nbytes", "<i8"),
+])
+
+class SnapshotWriter:
+    """
+    Appends bursts to a .snap file: codes to the file, frame records to the
+    sidecar, nothing kept in memory. flush() hands both to the OS (safe from a
+    killed process), flush(fsync=True) to the disk.
+
+    codec: a frame_codec name to compress the codes in chunk_frames chunks,
+    spread over frame_codec's thread pool; raw_bytes / codes_bytes / codec_s
+    give the ratio and speed.
+    """
+
+    def __init__(self, path, meta=None, codec=None, level=None, chunk_frames=frame_codec.CHUNK_FRAMES,
+                 delta=frame_codec.DELTA):
+        self.path = path
+        self.meta = dict(meta or {})
+        self.codec = codec
+        self.level = level
+        self.delta = bool(codec) and delta
+        self.chunk_frames = chunk_frames
+        self.n_frames = 0
+        self.n_points = None
+        self.dtype = None
+        self.t0 = self.dt = None
+        self.raw_bytes = 0
+        self.codes_bytes = 0
+        self.n_chunks = 0
+        self.codec_s = 0.0
+        self.table_offset = self.chunks_offset = 0     # set by close()
+        self._f = open(path, "wb")
+        self._frames = open(path + FRAMES_SUFFIX, "wb")
+        self._chunks = open(path + CHUNKS_SUFFIX, "wb") if codec else None
+        self._write_header()
+
+    def add_burst(self, t, burst, epochs_ns):
+        """burst: ScaledCodes of (n_frames, n_points) codes as decoded, t the frame time axis."""
+        codes = np.asarray(burst.codes)
+        if codes.size == 0:
+            return
+        if self.n_points is None:
+            self.n_points, self.dtype = codes.shape[1], codes.dtype.newbyteorder("<")
+            self.t0 = float(t[0])
+            self.dt = float(t[1] - t[0]) if len(t) > 1 else 0.0
+            self._write_header()    # shape and axis, so an unclosed file can be read
+        elif codes.shape[1] != self.n_points or codes.dtype != self.dtype:
+            raise ValueError(f"Burst of {codes.shape[1]} x {codes.dtype} points doesn't fit a "
+                             f"snapshot of {self.n_points} x {self.dtype}")
+
+        table = np.empty(len(codes), dtype=FRAME_DTYPE)
+        table["epoch_ns"] = epochs_ns
+        table["scale"] = burst.scale
+        table["offset"] = burst.offset
+        codes = np.ascontiguousarray(codes, dtype=self.dtype)
+        self.raw_bytes += codes.nbytes
+        # codes reach the OS before their records: a record on disk means its frame is complete
+        if self.codec:
+            t_codec = time.perf_counter()
+            chunks = frame_codec.encode_chunks(codes, self.codec, self.level, self.chunk_frames,
+                                               use_delta=self.delta)
+            self.codec_s += time.perf_counter() - t_codec
+            index = np.empty(len(chunks), dtype=CHUNK_DTYPE)
+            first = self.n_frames
+            for i, (n, blob) in enumerate(chunks):
+                index[i] = (first, n, HEADER_SIZE + self.codes_bytes, len(blob))
+                self._f.write(blob)
+                self.codes_bytes += len(blob)
+                first += n
+            self._f.flush()
+            self._chunks.write(index.tobytes())
+            self.n_chunks += len(chunks)
+        else:
+            self._f.write(codes.tobytes())
+            self._f.flush()
+            self.codes_bytes += codes.nbytes
+        self._frames.write(table.tobytes())
+        self.n_frames += len(codes)
+
+    @property
+    def nbytes(self):
+        """Bytes written so far, file and sidecars."""
+        return HEADER_SIZE + self.codes_bytes + self.n_frames * FRAME_DTYPE.itemsize + self.n_chunks * CHUNK_DTYPE.itemsize
+
+    @property
+    def closed(self):
+        return self._f is None
+
+    @property
+    def ratio(self):
+        """Raw over stored code bytes."""
+        return self.raw_bytes / self.codes_bytes if self.codes_bytes else float('nan')
+
+    @property
+    def _files(self):
+        return [f for f in (self._f, self._chunks, self._frames) if f is not None]
+
+    def flush(self, fsync=False):
+        for f in self._files:
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+    def close(self):
+        if self._f is None:
+            return
+        tails = []
+        for f, suffix in ((self._frames, FRAMES_SUFFIX), (self._chunks, CHUNKS_SUFFIX)):
+            if f is not None:
+                f.close()
+                with open(self.path + suffix, "rb") as sidecar:
+                    tails.append(sidecar.read())
+        table_offset = self._f.tell()
+        self._f.write(tails[0])
+        chunks_offset = self._f.tell() if self.codec else 0
+        if self.codec:
+            self._f.write(tails[1])
+        self._write_header(table_offset, chunks_offset)
+        self.table_offset, self.chunks_offset = table_offset, chunks_offset
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+        self._f = None
+        os.remove(self.path + FRAMES_SUFFIX)
+        if self.codec:
+            os.remove(self.path + CHUNKS_SUFFIX)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_header(self, table_offset=0, chunks_offset=0):
+        header = {
+            "version": VERSION,
+            "n_frames": self.n_frames,
+            "n_points": self.n_points or 0,
+            "dtype": self.dtype.str if self.dtype is not None else "<i2",
+            "t0": self.t0 or 0.0,
+            "dt": self.dt or 0.0,
+            "codes_offset": HEADER_SIZE,
+            "table_offset": table_offset,
+            "codec": self.codec,
+            "delta": self.delta,
+            "chunks_offset": chunks_offset,
+            "meta": self.meta,
+        }
+        raw = json.dumps(header).encode()
+        if 12 + len(raw) > HEADER_SIZE:
+            raise ValueError(f"Snapshot header too large: {len(raw)} bytes")
+        pos = self._f.tell()
+        self._f.seek(0)
+        self._f.write(MAGIC + len(raw).to_bytes(4, "little") + raw)
+        self._f.write(bytes(HEADER_SIZE - 12 - len(raw)))
+        self._f.seek(max(pos, HEADER_SIZE))
+
+class CompressedCodes:
+    """
+    The (n_frames, n_points) codes of a compressed snapshot: indexing with an
+    int, slice or mask decompresses the chunks it touches (in parallel) and
+    returns an array. The last chunk read is kept.
+    """
+
+    def __init__(self, path, index, codec, dtype, n_frames, n_points, delta=False):
+        self.index = index
+        self.codec = codec
+        self.delta = delta
+        self.dtype = dtype
+        self.shape = (n_frames, n_points)
+        self._raw = np.memmap(path, dtype=np.uint8, mode="r") if len(index) else None
+        self._last = (None, None)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _blob(self, c):
+        entry = self.index[c]
+        return self._raw[entry["offset"]:entry["offset"] + entry["nbytes"]]
+
+    def _chunks(self, ids):
+        cached, chunk = self._last
+        todo = [c for c in ids if c != cached]
+        decoded = dict(zip(todo, frame_codec.decode_chunks([self._blob(c) for c in todo], self.codec,
+                                                           self.dtype, self.shape[1], use_delta=self.delta)))
+        if cached in ids:
+            decoded[cached] = chunk
+        if ids:
+            self._last = (ids[-1], decoded[ids[-1]])
+        return decoded
+
+    def __getitem__(self, frames):
+        rows = np.arange(self.shape[0])[frames]
+        if np.ndim(rows) == 0:
+            return self[int(rows):int(rows) + 1][0]
+        chunk_of = np.searchsorted(self.index["first_frame"], rows, side="right") - 1
+        ids = np.unique(chunk_of).tolist()
+        decoded = self._chunks(ids)
+        out = np.empty((len(rows), self.shape[1]), dtype=self.dtype)
+        for c in ids:
+            sel = chunk_of == c
+            out[sel] = decoded[c][rows[sel] - self.index["first_frame"][c]]
+        return out
+
+class SnapshotFile:
+    """A .snap opened for reading; codes (when uncompressed) and the frame table are memory-mapped."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(HEADER_SIZE)
+        if head[:8] != MAGIC:
+            raise ValueError(f"Not a snapshot file: {path}")
+        n = int.from_bytes(head[8:12], "little")
+        self.header = json.loads(head[12:12 + n])
+        self.meta = self.header["meta"]
+        self.n_frames = self.header["n_frames"]
+        self.n_points = self.header["n_points"]
+        self.codec = self.header.get("codec")
+        dtype = np.dtype(self.header["dtype"])
+        table_path, table_offset = path, self.header["table_offset"]
+
+        # still open, or never closed: the whole frames both the file and the sidecars hold
+        self.complete = bool(table_offset)
+        if self.codec:
+            index = self._read_index(path, self.header["chunks_offset"] if self.complete else None)
+        if not self.complete:
+            table_path, table_offset = path + FRAMES_SUFFIX, 0
+            if self.codec:
+                on_disk = int(index["n_frames"].sum())
+            else:
+                frame_bytes = self.n_points * dtype.itemsize
+                on_disk = (os.path.getsize(path) - HEADER_SIZE) // frame_bytes if frame_bytes else 0
+            records = os.path.getsize(table_path) // FRAME_DTYPE.itemsize if os.path.exists(table_path) else 0
+            self.n_frames = max(min(on_disk, records), 0)
+
+        if self.n_frames:
+            self.frames = np.memmap(table_path, dtype=FRAME_DTYPE, mode="r",
+                                    offset=table_offset, shape=(self.n_frames,))
+        else:
+            self.frames = np.empty(0, dtype=FRAME_DTYPE)
+        if self.codec:
+            self.codes = CompressedCodes(path, index, self.codec, dtype, self.n_frames, self.n_points,
+                                         self.header.get("delta", False))
+        elif self.n_frames:
+            self.codes = np.memmap(path, dtype=dtype, mode="r",
+                                   offset=self.header["codes_offset"], shape=(self.n_frames, self.n_points))
+        else:
+            self.codes = np.empty((0, self.n_points), dtype=dtype)
+
+    @staticmethod
+    def _read_index(path, offset):
+        """Chunk entries from the file, or (offset None) from the sidecar of an unclosed one."""
+        if offset is None:
+            path, offset = path + CHUNKS_SUFFIX, 0
+            if not os.path.exists(path):
+                return np.empty(0, dtype=CHUNK_DTYPE)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            raw = f.read()
+        return np.frombuffer(raw[:len(raw) // CHUNK_DTYPE.itemsize * CHUNK_DTYPE.itemsize], dtype=CHUNK_DTYPE)
+
+    def __len__(self):
+        return self.n_frames
+
+    @property
+    def t(self):
+        """Time axis of one frame."""
+        return self.header["t0"] + np.arange(self.n_points) * self.header["dt"]
+
+    @property
+    def epochs_ns(self):
+        return self.frames["epoch_ns"]
+
+    def scaled(self, frames=slice(None)):
+        """Frames (slice or mask) as ScaledCodes over the mapped (or decompressed) codes, not scaled yet."""
+        table = self.frames[frames]
+        return ScaledCodes(self.codes[frames], table["scale"], table["offset"])
+
+    def volts(self, frames=slice(None)):
+        """Frames (slice or mask) scaled to volts, float64 (n, n_points)."""
+        return self.scaled(frames).volts()
+
+def open_snapshot(path):
+    return SnapshotFile(path)
+
+def load_compat(path):
+    """
+    (labels, values) as get_data() gives for snapshot_<ts>.csv: rows of t, v
+    with the frames laid end to end, each shifted by the previous frame's
+    last time, as collect_data_bulk wrote them.
+    """
+    snap = SnapshotFile(path)
+    t = snap.t
+    values = np.empty((snap.n_frames * snap.n_points, 2))
+    if snap.n_frames and snap.n_points:
+        rows = values.reshape(snap.n_frames, snap.n_points, 2)
+        np.add((t[-1] * np.arange(snap.n_frames))[:, None], t, out=rows[:, :, 0])
+        rows[:, :, 1] = snap.volts()
+    return {"t": 0, "v": 1}, values
+
+def pulses_compat(path):
+    """(first row, epoch s) per frame, the content of the matching pulses_<ts>.dat."""
+    snap = SnapshotFile(path)
+    rows = np.arange(snap.n_frames) * snap.n_points
+    return list(zip(rows.tolist(), (snap.epochs_ns / 1e9).tolist()))
@@ -1,5 +1,6 @@
 import pyvisa, time, serial
 import csv
+from meas_group import MeasGroup
 
 rm = pyvisa.ResourceManager()
 scope_usb = "USB0::0xF4EC::0x100C::SDS2HBAX900425::INSTR"
@@ -8,6 +9,7 @@ scope = rm.open_resource(scope_usb)
 scope.timeout = 1000
 scope.write_termination = '\n'
 scope.read_termination  = '\n'
+meas = MeasGroup(scope, range(1, 8))
 
 PORT = "COM1"
 
@@ -109,23 +111,14 @@ def read_loop():
     
     while True:
         # Try the “RESULT?” form first What does this mean
-        dt, ph, vpp, filt, avg_vpp, amplitude, rms  = float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan'), float('nan')
-        try:
-            ph = float(scope.query(":MEASure:ADVanced:P1:VALue?"))
-            dt = float(scope.query(":MEASure:ADVanced:P2:VALue?"))
-            vpp = float(scope.query(":MEASure:ADVanced:P3:VALue?"))
-            filt = float(scope.query(":MEASure:ADVanced:P4:VALue?"))
-            avg_vpp = float(scope.query(":MEASure:ADVanced:P5:VALue?"))
-            amplitude = float(scope.query(":MEASure:ADVanced:P6:VALue?"))
-            rms = float(scope.query(":MEASure:ADVanced:P7:VALue?"))
-
-            if ph > 360:
-                ph -= 360
-
-            if ph < 0:
-                ph += 360
-        except ValueError:
-            pass
+        # P1..P7 in one round trip, nan where the scope has no valid value
+        ph, dt, vpp, filt, avg_vpp, amplitude, rms = meas.read()
+
+        if ph > 360:
+            ph -= 360
+
+        if ph < 0:
+            ph += 360
 
         if dt != float('nan'): print(f"Δt = {dt*1e3:.3f} ms", end='  ')
         if ph != float('nan'): print(f"phase = {ph:6.2f}°", end=' ')
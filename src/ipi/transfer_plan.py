@@ -0,0 +1,103 @@
+"""
+Pick :WAVeform:WIDTh and :WAVeform:INTerval for sequence reads from a
+throughput budget in pulses/s.
+
+Every frame costs points * (1 or 2) bytes plus its 16-byte timestamp record,
+and the link moves a roughly fixed number of bytes per second, so the width
+and interval set how many pulses/s can be read out. Both cost resolution:
+  BYTE   the top 8 bits of the 12-bit code, a 16x coarser LSB
+  INT k  every k-th sample, k x coarser dt and k x fewer samples per pulse
+The per-pulse dose is an integral over the frame, so the figure of merit is
+the quantization noise of the frame mean, LSB / sqrt(12 * points): it covers
+both the LSB and the number of samples. choose() takes the candidate with the
+least of it among those that meet the budget (and keep dt fine enough).
+
+    python transfer_plan.py --budget 100 --points 20000   # the table for a setup
+"""
+import argparse
+import dataclasses
+import math
+
+import wavedesc
+
+WIDTHS = {"BYTE": 1, "WORD": 2}
+INTERVALS = (1, 2, 5, 10, 20, 50, 100)
+LINK_BYTES_PER_S = 8e6      # LAN DATA? rate; bytes / transfer_s in burst_log.csv gives the real one
+HEADROOM = 0.8              # share of the link the plan may use: commands, preambles, re-arm
+MAX_INTERVAL = 20           # coarser than this loses the pulse shape
+
+@dataclasses.dataclass(frozen=True)
+class TransferPlan:
+    width: str
+    interval: int
+    points: int             # transferred per frame
+    bytes_per_frame: int    # including the timestamp record
+    pulses_per_s: float     # what the link can read out at this setting
+    bits: int
+    dt: float               # s between transferred samples
+    lsb_v: float            # V per code
+    mean_noise_v: float     # quantization noise of the frame mean
+    budget: float = None
+    meets_budget: bool = True
+
+    def scope_settings(self):
+        return {":WAVeform:WIDTh": self.width, ":WAVeform:INTerval": str(self.interval)}
+
+    def as_dict(self):
+        return dataclasses.asdict(self)
+
+def plan(width, interval, wd, link_bytes_per_s=LINK_BYTES_PER_S, headroom=HEADROOM):
+    """TransferPlan for one width/interval, wd a WaveDesc of the current setup (any width)."""
+    points = wavedesc.transferred_points(wd, interval)
+    bytes_per_frame = points * WIDTHS[width] + wavedesc.TIMESTAMP_DTYPE.itemsize
+    bits = 8 if width == "BYTE" else 12
+    lsb = wd.vdiv / (wd.code_raw / (1 << (16 - bits)))
+    return TransferPlan(width, interval, points, bytes_per_frame,
+                        pulses_per_s=link_bytes_per_s * headroom / bytes_per_frame,
+                        bits=bits, dt=wd.interval * interval, lsb_v=lsb,
+                        mean_noise_v=lsb / math.sqrt(12 * points))
+
+def candidates(wd, link_bytes_per_s=LINK_BYTES_PER_S, headroom=HEADROOM):
+    return [plan(w, k, wd, link_bytes_per_s, headroom) for w in WIDTHS for k in INTERVALS]
+
+def choose(budget, wd, link_bytes_per_s=LINK_BYTES_PER_S, headroom=HEADROOM, max_interval=MAX_INTERVAL):
+    """
+    Finest setting that reads out `budget` pulses/s. If none does, the fastest
+    one within max_interval, with meets_budget=False.
+    """
+    cands = [p for p in candidates(wd, link_bytes_per_s, headroom) if p.interval <= max_interval]
+    ok = [p for p in cands if p.pulses_per_s >= budget]
+    if ok:
+        best = min(ok, key=lambda p: (p.mean_noise_v, p.interval))
+    else:
+        best = max(cands, key=lambda p: p.pulses_per_s)
+    return dataclasses.replace(best, budget=budget, meets_budget=bool(ok))
+
+def table(plans):
+    lines = [f"{'width':>5} {'int':>4} {'points':>7} {'B/frame':>8} {'pulses/s':>9} "
+             f"{'dt ns':>7} {'LSB mV':>7} {'mean noise uV':>14}"]
+    for p in plans:
+        lines.append(f"{p.width:>5} {p.interval:>4} {p.points:>7} {p.bytes_per_frame:>8} {p.pulses_per_s:>9.1f} "
+                     f"{p.dt * 1e9:>7.2f} {p.lsb_v * 1e3:>7.3f} {p.mean_noise_v * 1e6:>14.3f}")
+    return "\n".join(lines)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget", type=float, default=100, help="pulses/s to read out")
+    ap.add_argument("--points", type=int, default=20000, help="points per frame at :WAV:INT 1")
+    ap.add_argument("--sample-interval", type=float, default=0.5e-9)
+    ap.add_argument("--vdiv", type=float, default=0.5)
+    ap.add_argument("--link", type=float, default=LINK_BYTES_PER_S / 1e6, help="link MB/s")
+    args = ap.parse_args()
+
+    wd = wavedesc.WaveDesc(width=1, order=0, data_bytes=0, one_frame_pts=args.points, first_point=0,
+                           sparsing=1, read_frame=1, sum_frame=1, v_scale=args.vdiv, v_offset=0.0,
+                           code_raw=25 * 256, adc_bit=12, sn=0, interval=args.sample_interval,
+                           delay=0.0, tdiv_index=0, probe=1.0)
+    print(table(candidates(wd, args.link * 1e6)))
+    best = choose(args.budget, wd, args.link * 1e6)
+    print(f"\n{args.budget:g} pulses/s -> {best.width} :WAV:INT {best.interval}"
+          + ("" if best.meets_budget else " (budget not met)"))
+
+if __name__ == "__main__":
+    main()
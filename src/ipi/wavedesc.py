@@ -0,0 +1,258 @@
+"""
+SDS2000X HD WAVEDESC: parsing, code -> volt scaling (arithmetic, or a
+per-scaling lookup table straight from the raw samples), time axis and the
+per-frame timestamp table.
+
+parse() reads every field the scripts use with one precompiled struct and
+returns a frozen, slotted WaveDesc. Time axes are cached on (points, dt,
+origin), so consecutive bursts with the same setup get the same (read-only)
+array instead of a new np.arange each time.
+
+In sequence mode the preamble ends with one 16-byte timestamp record per
+returned frame:
+  [0:8]   seconds-within-minute (float64)
+  [8]     minutes  (uint8)
+  [9]     hours    (uint8)
+  [10]    day      (uint8)
+  [11]    month    (uint8)
+  [12:14] year     (int16 LE)
+  [14:16] reserved
+"""
+import dataclasses
+import functools
+import struct
+import numpy as np
+
+HORI_NUM = 10.0
+WAVEDESC_LEN = 346      # WAVEDESC block; the timestamp table follows it
+
+TDIV_ENUM = [
+    100e-12, 200e-12, 500e-12,
+    1e-9, 2e-9, 5e-9,
+    10e-9, 20e-9, 50e-9,
+    100e-9, 200e-9, 500e-9,
+    1e-6, 2e-6, 5e-6,
+    10e-6, 20e-6, 50e-6,
+    100e-6, 200e-6, 500e-6,
+    1e-3, 2e-3, 5e-3,
+    10e-3, 20e-3, 50e-3,
+    100e-3, 200e-3, 500e-3,
+    1, 2, 5, 10, 20, 50, 100, 200, 500, 1000,
+]
+
+# (offset, struct code, name), in offset order
+_FIELDS = [
+    (0x20, "H", "width"),           # 0=BYTE, 1=WORD
+    (0x22, "H", "order"),           # 0=LSB, 1=MSB
+    (0x3C, "i", "data_bytes"),      # WAVE_ARRAY_1
+    (0x74, "I", "one_frame_pts"),   # points of a single frame (before :WAV:INT decimation)
+    (0x84, "i", "first_point"),
+    (0x88, "i", "sparsing"),
+    (0x90, "I", "read_frame"),      # frames returned by this transfer
+    (0x94, "I", "sum_frame"),       # frames acquired
+    (0x9C, "f", "v_scale"),         # V/div pre-probe
+    (0xA0, "f", "v_offset"),        # V offset pre-probe
+    (0xA4, "f", "code_raw"),        # codes/div for the 16-bit container
+    (0xAC, "h", "adc_bit"),
+    (0xAE, "h", "sn"),
+    (0xB0, "f", "interval"),        # s/sample before decimation
+    (0xB4, "d", "delay"),           # horizontal position
+    (0x144, "h", "tdiv_index"),
+    (0x148, "f", "probe"),
+]
+
+def _layout(fields):
+    fmt, pos = "<", 0
+    for offset, code, _ in fields:
+        fmt += "x" * (offset - pos) + code
+        pos = offset + struct.calcsize("<" + code)
+    return struct.Struct(fmt)
+
+_DESC = _layout(_FIELDS)
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class WaveDesc:
+    width: int
+    order: int
+    data_bytes: int
+    one_frame_pts: int
+    first_point: int
+    sparsing: int
+    read_frame: int
+    sum_frame: int
+    v_scale: float
+    v_offset: float
+    code_raw: float
+    adc_bit: int
+    sn: int
+    interval: float
+    delay: float
+    tdiv_index: int
+    probe: float
+
+    @property
+    def vdiv(self):
+        return self.v_scale * self.probe
+
+    @property
+    def voff(self):
+        return self.v_offset * self.probe
+
+    @property
+    def tdiv(self):
+        return TDIV_ENUM[self.tdiv_index] if 0 <= self.tdiv_index < len(TDIV_ENUM) else None
+
+    @property
+    def bits(self):
+        # BYTE export is the top 8 bits of the container, WORD the 12-bit ADC code
+        return 8 if self.width == 0 else 12
+
+    @property
+    def code_per_div(self):
+        return self.code_raw / (1 << (16 - self.bits))
+
+    @property
+    def volts_per_code(self):
+        return self.vdiv / self.code_per_div
+
+    def as_dict(self):
+        return dataclasses.asdict(self)
+
+def parse(desc):
+    """WaveDesc from a PREamble payload (starting at the WAVEDESC block)."""
+    if len(desc) < _DESC.size:
+        raise ValueError(f"preamble too short: len={len(desc)} < {_DESC.size}")
+    return WaveDesc(*_DESC.unpack_from(desc))
+
+def pack(wd, tail=b""):
+    """PREamble payload for wd, the inverse of parse() (fake scopes, benchmarks). tail: e.g. the timestamp table."""
+    buf = bytearray(WAVEDESC_LEN)
+    _DESC.pack_into(buf, 0, *dataclasses.astuple(wd))
+    buf[0:8] = b"WAVEDESC"
+    return bytes(buf) + bytes(tail)
+
+def codes(wd, data):
+    """Signed ADC codes of a DATA? payload, shaped (read_frame, points)."""
+    if wd.width == 0:
+        c = np.frombuffer(data, dtype=np.int8)        # codes above 127 are negative: plain int8
+    else:
+        # 12-bit code in the top of the 16-bit word: an arithmetic shift of the
+        # signed container gives the signed code directly
+        c = np.frombuffer(data, dtype=">i2" if wd.order == 1 else "<i2") >> 4
+    return c.reshape(max(wd.read_frame, 1), -1)
+
+def volts(wd, c):
+    return c * wd.volts_per_code - wd.voff
+
+def volts_lut(wd, dtype=np.float64):
+    """
+    Volts of every possible raw sample under wd's scaling, indexed by the
+    unsigned BYTE (256 entries) or WORD (65536, the low 4 bits don't matter)
+    as transferred. Cached per scaling, read-only.
+    """
+    return _lut(wd.width, wd.volts_per_code, wd.voff, np.dtype(dtype))
+
+@functools.lru_cache(maxsize=16)
+def _lut(width, volts_per_code, voff, dtype):
+    if width == 0:
+        c = np.arange(256, dtype=np.uint8).view(np.int8)
+    else:
+        c = np.arange(1 << 16, dtype=np.uint16).view(np.int16) >> 4
+    lut = (c * volts_per_code - voff).astype(dtype)
+    lut.flags.writeable = False
+    return lut
+
+def decode_volts(wd, data, out=None, dtype=np.float64):
+    """
+    Volts of a DATA? payload shaped (read_frame, points): one np.take of the
+    raw samples through volts_lut. out, when given, is a reusable flat buffer
+    of at least that many samples (its dtype wins over dtype); the result is a
+    view into it.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8 if wd.width == 0 else (">u2" if wd.order == 1 else "<u2"))
+    lut = volts_lut(wd, out.dtype if out is not None else dtype)
+    out = np.empty(len(raw), dtype=lut.dtype) if out is None else out[:len(raw)]
+    np.take(lut, raw, out=out, mode="clip")     # indices can't be out of range; "clip" skips the bounds check
+    return out.reshape(max(wd.read_frame, 1), -1)
+
+def transferred_points(wd, interval):
+    """Points per frame DATA? returns at :WAV:INTerval interval; the scope rounds down."""
+    return int(wd.one_frame_pts) // max(int(interval), 1)
+
+def time_axis(wd, n_pts, interval=1, zero_start=False):
+    """
+    Time axis of one frame of n_pts points transferred at :WAV:INTerval
+    interval, i.e. spaced wd.interval * interval (not one_frame_pts / n_pts,
+    which is off when the scope rounded the point count down). Siglent's
+    origin (-tdiv*HORI_NUM/2 - delay) unless zero_start. The array is shared
+    between calls, don't modify it.
+    """
+    dt = wd.interval * max(int(interval), 1)
+    if zero_start:
+        t0 = 0.0
+    elif wd.tdiv is not None:
+        t0 = -(wd.tdiv * HORI_NUM / 2) - wd.delay
+    else:
+        t0 = -wd.delay
+    return _axis(n_pts, dt, t0)
+
+@functools.lru_cache(maxsize=16)
+def _axis(n_pts, dt, t0):
+    t = t0 + np.arange(n_pts, dtype=np.float64) * dt
+    t.flags.writeable = False
+    return t
+
+TIMESTAMP_DTYPE = np.dtype([
+    ("seconds", "<f8"),
+    ("minute", "u1"),
+    ("hour", "u1"),
+    ("day", "u1"),
+    ("month", "u1"),
+    ("year", "<i2"),
+    ("reserved", "V2"),
+])
+
+def timestamp_records(desc, n_frames):
+    """The timestamp table as a structured array (a view into desc, no copy)."""
+    tail_len = TIMESTAMP_DTYPE.itemsize * n_frames
+    if len(desc) < tail_len:
+        raise ValueError(f"preamble too short: len={len(desc)} < {tail_len}")
+    # taken from the end: robust across FW variants
+    return np.frombuffer(desc, dtype=TIMESTAMP_DTYPE, count=n_frames, offset=len(desc) - tail_len)
+
+def timestamp_table(epochs_ns):
+    """Timestamp records for naive epoch ns, the inverse of frame_epochs_ns (simulators)."""
+    ns = np.asarray(epochs_ns, dtype=np.int64)
+    rec = np.zeros(len(ns), dtype=TIMESTAMP_DTYPE)
+    dt = ns.astype("datetime64[ns]")
+    years = dt.astype("datetime64[Y]")
+    months = dt.astype("datetime64[M]")
+    days = dt.astype("datetime64[D]")
+    minutes = dt.astype("datetime64[m]")
+    rec["year"] = years.astype(np.int64) + 1970
+    rec["month"] = (months - years).astype(np.int64) + 1
+    rec["day"] = (days - months).astype(np.int64) + 1
+    rec["hour"] = (minutes - days).astype(np.int64) // 60
+    rec["minute"] = (minutes - days).astype(np.int64) % 60
+    rec["seconds"] = (dt - minutes).astype(np.int64) / 1e9
+    return rec.tobytes()
+
+def frame_epochs_ns(desc, n_frames):
+    """
+    Epoch nanoseconds of every frame as an int64 array, the scope's clock
+    taken as-is (naive, no timezone).
+    """
+    rec = timestamp_records(desc, n_frames)
+
+    # calendar date -> days since 1970-01-01 through datetime64 arithmetic
+    years = (rec["year"].astype(np.int64) - 1970).astype("datetime64[Y]")
+    months = years.astype("datetime64[M]") + (rec["month"].astype(np.int64) - 1).astype("timedelta64[M]")
+    days = (months.astype("datetime64[D]") + (rec["day"].astype(np.int64) - 1).astype("timedelta64[D]")).astype(np.int64)
+
+    minutes = (days * 24 + rec["hour"]) * 60 + rec["minute"]
+
+    # whole seconds + rounded fraction, as the per-frame code did
+    secs = rec["seconds"]
+    whole = np.floor(secs)
+    frac_ns = np.rint((secs - whole) * 1e9).astype(np.int64)
+    return (minutes * 60 + whole.astype(np.int64)) * 1_000_000_000 + frac_ns